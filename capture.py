@@ -0,0 +1,73 @@
+import threading
+
+import cv2
+import mss
+import numpy as np
+
+from pipeline import Frame
+
+
+class FrameRing:
+    """
+    Кольцо заранее выделенных Ч/Б буферов для снимков экрана.
+
+    Каждый снимок получает номер поколения. Буфер переиспользуется через
+    slots снимков, поэтому потребитель, который держит кадр дольше,
+    должен проверить is_valid() после того, как скопировал нужные данные.
+    """
+
+    def __init__(self, shape, slots=8, storage=None, owners=None):
+        self.shape = tuple(shape)
+        # storage - непрерывный массив (slots, *shape); его можно разместить в общей памяти
+        if storage is None:
+            storage = np.empty((slots, *self.shape), dtype=np.uint8)
+        if owners is None:
+            owners = np.zeros(slots, dtype=np.int64)
+        self._buffers = [storage[i] for i in range(slots)]
+        self._owners = owners # Поколение снимка, который сейчас лежит в каждом буфере
+        self._generation = int(owners.max())
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Возвращает (поколение, буфер) для следующего снимка."""
+        with self._lock:
+            self._generation += 1
+            slot = self._generation % len(self._buffers)
+            self._owners[slot] = self._generation
+            return self._generation, self._buffers[slot]
+
+    def is_valid(self, generation):
+        """Буфер снимка еще не перезаписан более новым."""
+        return self._owners[generation % len(self._buffers)] == generation
+
+    def view(self, generation):
+        """Буфер, в котором лежит (или лежал) снимок данного поколения."""
+        return self._buffers[generation % len(self._buffers)]
+
+
+class ScreenCapture:
+    """
+    Захват области экрана без промежуточных копий: буфер BGRA от mss
+    оборачивается в массив NumPy и сразу переводится в оттенки серого
+    в буфер из кольца. Кольцо можно передать готовым (например, в общей памяти).
+    """
+
+    def __init__(self, area, slots=8, ring=None):
+        self.area = area
+        self.sct = mss.mss()
+        self.ring = ring or FrameRing((area["height"], area["width"]), slots)
+
+    def grab(self):
+        sct_img = self.sct.grab(self.area)
+        width, height = sct_img.size
+        # raw - это bytearray, frombuffer не копирует данные
+        bgra = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(height, width, 4)
+        generation, gray = self.ring.acquire()
+        if self.ring.shape == (height, width):
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY, dst=gray)
+        else:
+            # Физический размер снимка может отличаться от логического (HiDPI):
+            # приводим к логическому, в котором заданы области
+            cv2.resize(cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY), (self.ring.shape[1], self.ring.shape[0]),
+                       dst=gray, interpolation=cv2.INTER_AREA)
+        return Frame(image=gray, ring=self.ring, generation=generation)
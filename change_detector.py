@@ -0,0 +1,124 @@
+import zlib
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class ChangeResult:
+    """Результат сравнения кадра с опорным."""
+    changed: bool
+    diff: float = 0.0 # Доля изменившейся площади, в процентах
+    tiles: list = field(default_factory=list) # Изменившиеся тайлы: список (строка, столбец)
+    stage: str = "" # На каком этапе принято решение: first / hash / checksum / ssim
+
+
+# Наименьшее окно SSIM в skimage по умолчанию; тайлы не делаются меньше
+SSIM_WIN_SIZE = 7
+
+
+def _split_ranges(length, parts):
+    """Делит отрезок [0, length) на parts почти равных частей."""
+    bounds = np.linspace(0, length, parts + 1).astype(int)
+    return [(int(bounds[i]), int(bounds[i + 1])) for i in range(parts)]
+
+
+class ChangeDetector:
+    """
+    Многоступенчатый детектор изменений Ч/Б кадра.
+
+    1. Блочный хэш (средние по блокам уменьшенного кадра) отсекает
+       неизменившиеся кадры за микросекунды.
+    2. Контрольные суммы по тайлам находят изменившиеся участки.
+    3. SSIM считается только для "сомнительных" тайлов, где разница мала.
+
+    Сравнение идет с последним кадром, признанным изменившимся, поэтому
+    медленный дрейф изображения тоже будет замечен.
+    """
+
+    def __init__(self, grid=(5, 7), hash_size=(64, 16), hash_tolerance=2,
+                 definite_mad=8.0, ssim_threshold=1.0):
+        self.grid = grid # Тайлов по вертикали и горизонтали
+        self.hash_size = hash_size # Размер уменьшенного кадра (ширина, высота)
+        self.hash_tolerance = hash_tolerance # Допустимое отклонение среднего по блоку
+        self.definite_mad = definite_mad # Средняя разница пикселей, при которой тайл точно изменился
+        self.ssim_threshold = ssim_threshold # Порог различия тайла по SSIM, в процентах
+        self.reset()
+
+    def reset(self):
+        self._ref = None
+        self._ref_hash = None
+        self._ref_sums = None
+        self._rows = None
+        self._cols = None
+
+    def _block_hash(self, gray):
+        return cv2.resize(gray, self.hash_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def _tile_sums(self, gray):
+        return [
+            [zlib.crc32(np.ascontiguousarray(gray[r0:r1, c0:c1])) for (c0, c1) in self._cols]
+            for (r0, r1) in self._rows
+        ]
+
+    def _accept(self, gray, block_hash, sums):
+        self._ref = gray.copy()
+        self._ref_hash = block_hash
+        self._ref_sums = sums
+
+    def update(self, gray):
+        """Сравнивает кадр с опорным и, если он изменился, делает его опорным."""
+        if self._ref is None or self._ref.shape != gray.shape:
+            height, width = gray.shape[:2]
+            # В узкой области (строка субтитров) тайлов меньше, чтобы их сторона была не меньше окна SSIM
+            self._rows = _split_ranges(height, max(1, min(self.grid[0], height // SSIM_WIN_SIZE)))
+            self._cols = _split_ranges(width, max(1, min(self.grid[1], width // SSIM_WIN_SIZE)))
+            self._accept(gray, self._block_hash(gray), self._tile_sums(gray))
+            tiles = [(r, c) for r in range(len(self._rows)) for c in range(len(self._cols))]
+            return ChangeResult(changed=True, diff=100.0, tiles=tiles, stage="first")
+
+        # Этап 1: блочный хэш
+        block_hash = self._block_hash(gray)
+        if np.abs(block_hash - self._ref_hash).max() <= self.hash_tolerance:
+            return ChangeResult(changed=False, stage="hash")
+
+        # Этап 2: контрольные суммы тайлов
+        sums = self._tile_sums(gray)
+        candidates = [
+            (r, c)
+            for r in range(len(self._rows))
+            for c in range(len(self._cols))
+            if sums[r][c] != self._ref_sums[r][c]
+        ]
+        if not candidates:
+            return ChangeResult(changed=False, stage="checksum")
+
+        # Этап 3: SSIM только для тайлов с небольшой разницей
+        stage = "checksum"
+        changed_tiles = []
+        changed_area = 0
+        for (r, c) in candidates:
+            r0, r1 = self._rows[r]
+            c0, c1 = self._cols[c]
+            tile = gray[r0:r1, c0:c1]
+            ref_tile = self._ref[r0:r1, c0:c1]
+            mad = np.abs(tile.astype(np.int16) - ref_tile).mean()
+            # Область тоньше окна SSIM: тайл с другой контрольной суммой считается изменившимся
+            win_size = min(SSIM_WIN_SIZE, (min(r1 - r0, c1 - c0) - 1) | 1)
+            if mad < self.definite_mad and win_size >= 3:
+                # skimage импортируется только когда SSIM действительно нужен
+                from skimage.metrics import structural_similarity as ssim
+                stage = "ssim"
+                score = ssim(tile, ref_tile, data_range=255, win_size=win_size)
+                if (1 - score) * 100 < self.ssim_threshold:
+                    continue
+            changed_tiles.append((r, c))
+            changed_area += (r1 - r0) * (c1 - c0)
+
+        if not changed_tiles:
+            return ChangeResult(changed=False, stage=stage)
+
+        self._accept(gray, block_hash, sums)
+        diff = changed_area * 100 / (gray.shape[0] * gray.shape[1])
+        return ChangeResult(changed=True, diff=diff, tiles=changed_tiles, stage=stage)
@@ -0,0 +1,107 @@
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+FRAMES_FILE = "frames.npy"
+INDEX_FILE = "index.json"
+RAW_FILE = "frames.raw"
+
+
+class FrameRecorder:
+    """
+    Записывает Ч/Б снимки объединенной области в корпус для воспроизведения.
+
+    Корпус - это каталог со стеком кадров frames.npy (читается через
+    memmap) и индексом index.json: область захвата, области распознавания
+    и список (время, номер кадра). Подряд идущие одинаковые кадры хранятся
+    один раз. Для оценки точности OCR в индекс можно вручную добавить
+    разметку "truth": {"номер кадра": {"область": "текст"}}.
+    """
+
+    def __init__(self, path, area, regions):
+        self.path = path
+        self.area = area
+        self.regions = {r.name: {"top": r.top, "left": r.left, "width": r.width, "height": r.height} for r in regions}
+        os.makedirs(path, exist_ok=True)
+        self._raw = open(os.path.join(path, RAW_FILE), "wb")
+        self._shape = None
+        self._count = 0
+        self._last_crc = None
+        self._entries = []
+        self._started_at = time.monotonic()
+
+    def add(self, frame):
+        image = frame.image
+        if self._shape is None:
+            self._shape = image.shape
+        elif image.shape != self._shape:
+            return # Размер области изменился посреди записи - такие кадры не пишем
+
+        data = image.tobytes()
+        crc = zlib.crc32(data)
+        if crc != self._last_crc:
+            self._raw.write(data)
+            self._count += 1
+            self._last_crc = crc
+        self._entries.append([round(frame.captured_at - self._started_at, 4), self._count - 1])
+
+    def close(self):
+        """Переносит кадры в frames.npy и записывает индекс."""
+        self._raw.close()
+        raw_path = os.path.join(self.path, RAW_FILE)
+        frames_path = os.path.join(self.path, FRAMES_FILE)
+        if self._count:
+            shape = (self._count, *self._shape)
+            raw = np.memmap(raw_path, dtype=np.uint8, mode="r", shape=shape)
+            frames = np.lib.format.open_memmap(frames_path, mode="w+", dtype=np.uint8, shape=shape)
+            frames[:] = raw
+            frames.flush()
+            del raw, frames
+        else:
+            # Пустой стек, чтобы корпус без кадров тоже открывался
+            np.save(frames_path, np.empty((0, self.area["height"], self.area["width"]), dtype=np.uint8))
+        os.remove(raw_path)
+
+        with open(os.path.join(self.path, INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump({"area": self.area, "regions": self.regions, "entries": self._entries}, f)
+        print(f"Корпус записан: {self.path} ({len(self._entries)} снимков, {self._count} уникальных кадров).")
+
+
+class FrameCorpus:
+    """Записанный корпус кадров, открытый только для чтения."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE), encoding="utf-8") as f:
+            index = json.load(f)
+        self.area = index["area"]
+        self.regions = index["regions"]
+        self.entries = index["entries"]
+        # Необязательная разметка: номер кадра -> {область: правильный текст}
+        self.truth = index.get("truth", {})
+        frames_path = os.path.join(path, FRAMES_FILE)
+        if self.entries or os.path.exists(frames_path):
+            self.frames = np.load(frames_path, mmap_mode="r")
+        else:
+            # Запись без кадров (старые версии не создавали frames.npy)
+            self.frames = np.empty((0, self.area["height"], self.area["width"]), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        """Выдает (время от начала записи, Ч/Б кадр)."""
+        for timestamp, frame_index in self.entries:
+            yield timestamp, self.frames[frame_index]
+
+    def items(self):
+        """Выдает (время от начала записи, номер кадра, Ч/Б кадр)."""
+        for timestamp, frame_index in self.entries:
+            yield timestamp, frame_index, self.frames[frame_index]
+
+    def expected_text(self, frame_index, region):
+        """Правильный текст области на кадре или None, если кадр не размечен."""
+        return self.truth.get(str(frame_index), {}).get(region)
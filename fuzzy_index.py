@@ -0,0 +1,186 @@
+import re
+from collections import Counter, OrderedDict
+
+from translation_memory import normalize_text
+
+# Символы, которые OCR путает между собой; замена внутри группы - дрожание распознавания
+_CONFUSABLE_GROUPS = ("1Il|!i", "0Oo", "'`\u2018\u2019", "\"\u201c\u201d", ",.", ":;", "-\u2013\u2014")
+_CONFUSABLE = {char: group for group in _CONFUSABLE_GROUPS for char in group}
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def _ngrams(text, n):
+    """Символьные n-граммы строки с границами."""
+    padded = f"\x02{text}\x03"
+    return [padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))]
+
+
+def bounded_levenshtein(a, b, max_distance):
+    """
+    Расстояние Левенштейна, ограниченное сверху.
+    Возвращает max_distance + 1, если строки отличаются сильнее.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) > len(b):
+        a, b = b, a
+
+    previous = list(range(len(a) + 1))
+    for i, cb in enumerate(b, 1):
+        current = [i] + [0] * len(a)
+        # Считаем только полосу шириной 2 * max_distance вокруг диагонали
+        lo = max(1, i - max_distance)
+        hi = min(len(a), i + max_distance)
+        if lo > 1:
+            current[lo - 1] = max_distance + 1
+        row_min = current[lo - 1] if lo > 1 else i
+        for j in range(lo, hi + 1):
+            cost = 0 if a[j - 1] == cb else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            current[j] = value
+            row_min = min(row_min, value)
+        for j in range(hi + 1, len(a) + 1):
+            current[j] = max_distance + 1
+        if row_min > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[len(a)], max_distance + 1)
+
+
+def _is_noise(char):
+    """Пробел или знак препинания: их OCR теряет и добавляет чаще всего."""
+    return not char.isalnum()
+
+
+def _confusable(a, b):
+    if _is_noise(a) and _is_noise(b):
+        return True
+    group = _CONFUSABLE.get(a)
+    return group is not None and b in group
+
+
+def ocr_distance(a, b, max_distance):
+    """
+    Расстояние Левенштейна, в котором допустимы только ошибки OCR: замена
+    символа на похожий (1/I/l/|, знаки препинания), пропуск или лишний
+    пробел или знак препинания. Пропуск буквы ("can't" -> "can") - это уже
+    другой текст. Возвращает max_distance + 1, если строки так не сводятся
+    друг к другу.
+    """
+    limit = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return limit
+
+    previous = [limit] * (len(a) + 1)
+    previous[0] = 0
+    for j in range(1, len(a) + 1):
+        if not _is_noise(a[j - 1]) or previous[j - 1] >= limit:
+            break
+        previous[j] = previous[j - 1] + 1
+    for cb in b:
+        noise_b = _is_noise(cb)
+        current = [limit] * (len(a) + 1)
+        if noise_b:
+            current[0] = min(previous[0] + 1, limit)
+        for j in range(1, len(a) + 1):
+            ca = a[j - 1]
+            if ca == cb:
+                value = previous[j - 1]
+            else:
+                value = previous[j - 1] + 1 if _confusable(ca, cb) else limit
+            if noise_b:
+                value = min(value, previous[j] + 1)
+            if _is_noise(ca):
+                value = min(value, current[j - 1] + 1)
+            current[j] = min(value, limit)
+        if min(current) >= limit:
+            return limit
+        previous = current
+    return previous[len(a)]
+
+
+class FuzzyIndex:
+    """
+    Индекс недавно переведенных строк для поиска почти-дубликатов.
+
+    Кандидаты отбираются по общим символьным n-граммам (q-gram фильтр),
+    затем проверяются расстоянием, в котором допустимы только ошибки OCR.
+    Число допустимых правок растет с длиной строки, а строки с разными
+    числами не совпадают никогда: "10 монет" и "18 монет" - разный текст.
+    """
+
+    def __init__(self, max_entries=256, max_distance=2, min_length=8, ngram=3, chars_per_edit=12):
+        self.max_entries = max_entries
+        self.max_distance = max_distance # Максимальное число правок для совпадения
+        self.min_length = min_length # Короткие строки сравниваются только точно
+        self.chars_per_edit = chars_per_edit # Одна правка допускается на каждые столько символов
+        self.ngram = ngram
+        self._entries = OrderedDict() # исходный текст -> перевод
+        self._postings = {} # n-грамма -> множество исходных строк
+
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, text, translated_text):
+        key = normalize_text(text)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._entries[key] = translated_text
+            return
+
+        self._entries[key] = translated_text
+        for gram in set(_ngrams(key, self.ngram)):
+            self._postings.setdefault(gram, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            for gram in set(_ngrams(old_key, self.ngram)):
+                sources = self._postings.get(gram)
+                if sources is not None:
+                    sources.discard(old_key)
+                    if not sources:
+                        del self._postings[gram]
+
+    def lookup(self, text):
+        """Возвращает перевод ближайшей известной строки или None."""
+        key = normalize_text(text)
+        translated_text = self._entries.get(key)
+        if translated_text is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return translated_text
+
+        max_distance = min(self.max_distance, len(key) // self.chars_per_edit)
+        if len(key) < self.min_length or max_distance == 0:
+            self.misses += 1
+            return None
+
+        digits = _DIGITS_RE.findall(key)
+        grams = set(_ngrams(key, self.ngram))
+        # Каждая правка затрагивает не более n n-грамм
+        required = len(grams) - max_distance * self.ngram
+        shared = Counter()
+        for gram in grams:
+            for source in self._postings.get(gram, ()):
+                shared[source] += 1
+
+        best_key = None
+        best_distance = max_distance + 1
+        for source, count in shared.most_common():
+            if count < required:
+                break
+            if _DIGITS_RE.findall(source) != digits:
+                continue
+            distance = ocr_distance(key, source, max_distance)
+            if distance < best_distance:
+                best_key, best_distance = source, distance
+                if distance <= 1:
+                    break
+
+        if best_key is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(best_key)
+        self.hits += 1
+        return self._entries[best_key]
@@ -0,0 +1,171 @@
+import json
+import os
+import re
+
+# Заменитель термина при переводе: номера и скобки модель переводит как есть
+PLACEHOLDER = "[{}]"
+_PLACEHOLDER_RE = re.compile(r"\[\s*(\d+)\s*\]")
+# Что остается от предложения, целиком покрытого терминами
+_FILLER_RE = re.compile(r"[\W_]+")
+
+
+def _lower(text):
+    """Нижний регистр без изменения длины строки (позиции совпадений остаются верными)."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо-Корасик: находит все вхождения всех терминов за один
+    проход по тексту. Время поиска зависит от длины текста и числа
+    найденных совпадений, но не от размера словаря.
+    """
+
+    def __init__(self, terms):
+        self._goto = [{}] # Переходы по символу
+        self._fail = [0] # Переход при несовпадении (самый длинный собственный суффикс)
+        self._out = [None] # (длина термина, значение), если в узле заканчивается термин
+        self._dict_link = [0] # Ближайший по суффиксам узел, где заканчивается термин
+
+        for term, value in terms.items():
+            node = 0
+            for char in term:
+                following = self._goto[node].get(char)
+                if following is None:
+                    following = self._goto[node][char] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(None)
+                    self._dict_link.append(0)
+                node = following
+            self._out[node] = (len(term), value)
+        self._build_links()
+
+    def __len__(self):
+        return sum(1 for out in self._out if out is not None)
+
+    def _build_links(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, following in self._goto[node].items():
+                queue.append(following)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                fail = self._fail[following]
+                self._dict_link[following] = fail if self._out[fail] is not None else self._dict_link[fail]
+
+    def finditer(self, text):
+        """Выдает (начало, конец, значение) для всех вхождений терминов."""
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if out[node] is not None else dict_link[node]
+            while match:
+                length, value = out[match]
+                yield i + 1 - length, i + 1, value
+                match = dict_link[match]
+
+
+class Glossary:
+    """
+    Словарь терминов (имена, предметы, элементы интерфейса) с фиксированным переводом.
+
+    Перед переводом найденные термины заменяются заменителями [0], [1], ...,
+    а после перевода заменители возвращаются в виде перевода из словаря.
+    Так модель не переводит термины каждый раз по-разному, а предложения,
+    различающиеся только терминами, попадают в кэш переводов под одним ключом.
+    Термин без перевода защищается: он остается в тексте как есть.
+
+    Файл: по одной записи в строке "термин<TAB>перевод" или "термин = перевод",
+    строки с # - комментарии; либо JSON-словарь {"термин": "перевод"}.
+    """
+
+    def __init__(self, entries):
+        terms = {}
+        for source, target in entries.items():
+            key = _lower(" ".join(source.split()))
+            if key:
+                terms[key] = target
+        self.automaton = AhoCorasick(terms)
+
+    def __len__(self):
+        return len(self.automaton)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            if os.path.splitext(path)[1].lower() == ".json":
+                return cls(json.load(f))
+            entries = {}
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                source, separator, target = line.partition("\t")
+                if not separator:
+                    source, _, target = line.partition("=")
+                entries[source.strip()] = target.strip()
+            return cls(entries)
+
+    def find(self, text):
+        """
+        Термины в тексте: список (начало, конец, перевод) без перекрытий.
+        Совпадение должно стоять на границах слов; из перекрывающихся
+        выбирается то, что начинается раньше, а при равенстве - более длинное.
+        """
+        matches = []
+        for start, end, target in self.automaton.finditer(_lower(text)):
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            if end < len(text) and text[end].isalnum():
+                continue
+            matches.append((start, end, target))
+
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        position = 0
+        for start, end, target in matches:
+            if start >= position:
+                selected.append((start, end, target))
+                position = end
+        return selected
+
+    def protect(self, text):
+        """
+        Заменяет термины заменителями. Возвращает (текст с заменителями,
+        список переводов терминов по номерам заменителей).
+        """
+        parts = []
+        renderings = []
+        position = 0
+        for start, end, target in self.find(text):
+            parts.append(text[position:start])
+            parts.append(PLACEHOLDER.format(len(renderings)))
+            renderings.append(target or text[start:end])
+            position = end
+        if not renderings:
+            return text, renderings
+        parts.append(text[position:])
+        return "".join(parts), renderings
+
+    @staticmethod
+    def is_covered(protected):
+        """Текст состоит только из терминов, пробелов и знаков препинания - модель не нужна."""
+        return not _FILLER_RE.sub("", _PLACEHOLDER_RE.sub("", protected))
+
+    @staticmethod
+    def restore(translated, renderings):
+        """Подставляет переводы терминов; None, если модель потеряла или исказила заменитель."""
+        found = [int(number) for number in _PLACEHOLDER_RE.findall(translated)]
+        if sorted(found) != list(range(len(renderings))):
+            return None
+        return _PLACEHOLDER_RE.sub(lambda m: renderings[int(m.group(1))], translated)
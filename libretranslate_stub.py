@@ -0,0 +1,85 @@
+"""
+Минимальный сервер с API LibreTranslate (POST /translate) для проверки
+сетевого переводчика без настоящего сервера.
+
+Без --argos "переводом" считается исходный текст с префиксом; с --argos
+тексты переводятся установленной моделью argostranslate через
+CTranslate2, и сервер можно запустить на другой машине в сети.
+
+Примеры:
+    python libretranslate_stub.py --port 5000
+    python libretranslate_stub.py --host 0.0.0.0 --port 5000 --argos
+    python libretranslate_stub.py --delay 3   # проверка таймаутов клиента
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(translate_batch, delay=0.0):
+    lock = threading.Lock() # Модель переводит один пакет за раз
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive: соединение остается открытым между запросами
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/translate":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length))
+                texts = payload["q"]
+            except (ValueError, KeyError):
+                self.send_error(400)
+                return
+
+            single = isinstance(texts, str)
+            if delay:
+                time.sleep(delay)
+            with lock:
+                translated = translate_batch([texts] if single else texts)
+            body = json.dumps(
+                {"translatedText": translated[0] if single else translated}, ensure_ascii=False
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный сервер с API LibreTranslate.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--argos", action="store_true", help="переводить моделью argostranslate")
+    parser.add_argument("--from", dest="from_code", default="en")
+    parser.add_argument("--to", dest="to_code", default="ru")
+    parser.add_argument("--delay", type=float, default=0.0, help="задержка ответа, секунды")
+    args = parser.parse_args()
+
+    if args.argos:
+        from translation_service import ArgosBatchTranslator
+        translate_batch = ArgosBatchTranslator(args.from_code, args.to_code).translate_batch
+    else:
+        translate_batch = lambda texts: [f"[{args.to_code}] {text}" for text in texts]
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(translate_batch, args.delay))
+    print(f"Сервер перевода: http://{args.host}:{args.port}/translate")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
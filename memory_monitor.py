@@ -0,0 +1,104 @@
+import os
+import sys
+import threading
+import tracemalloc
+
+
+def current_rss():
+    """Текущий объем резидентной памяти процесса в байтах (None, если узнать не удалось)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    if sys.platform.startswith("linux"):
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+        return None
+
+    # macOS и прочие: только пиковое значение (в байтах на macOS)
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class MemoryMonitor:
+    """
+    Наблюдение за памятью в долгих сеансах.
+
+    Раз в interval секунд снимает RSS процесса (датчик rss_bytes в
+    метриках) и, если включен tracemalloc, печатает места, где с момента
+    запуска больше всего выросло число выделений Python.
+    """
+
+    def __init__(self, metrics, interval=60.0, tracemalloc_frames=0, top=10):
+        self.metrics = metrics
+        self.interval = interval
+        self.tracemalloc_frames = tracemalloc_frames # Глубина стека tracemalloc (0 - не включать)
+        self.top = top
+        self.baseline_rss = None
+        self.last_rss = None
+        self._baseline_snapshot = None
+
+    def sample(self):
+        rss = current_rss()
+        if rss is not None:
+            if self.baseline_rss is None:
+                self.baseline_rss = rss
+            self.last_rss = rss
+        return rss
+
+    def report_allocations(self):
+        """Печатает самые выросшие места выделения памяти с момента первого снимка."""
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        if self._baseline_snapshot is None:
+            self._baseline_snapshot = snapshot
+            return
+        print(f"Рост памяти Python (tracemalloc), топ {self.top}:")
+        for stat in snapshot.compare_to(self._baseline_snapshot, "lineno")[:self.top]:
+            print(f"  {stat}")
+
+    def run(self, stop_event):
+        if self.tracemalloc_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+        self.metrics.gauge("rss_bytes", lambda: self.last_rss)
+        self.metrics.gauge("rss_growth_bytes", lambda: self.last_rss - self.baseline_rss)
+        while True:
+            self.sample()
+            self.report_allocations()
+            if stop_event.wait(self.interval):
+                break
+
+    def start(self, stop_event):
+        thread = threading.Thread(target=self.run, args=(stop_event,), daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """Скользящее окно последних значений плюс общие сумма и количество."""
+
+    def __init__(self, window=2048):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self):
+        samples = sorted(self._samples)
+        result = {"count": self.count, "sum": round(self.total, 6)}
+        if samples:
+            for q in QUANTILES:
+                result[f"p{int(q * 100)}"] = round(samples[min(len(samples) - 1, int(q * len(samples)))], 6)
+            result["max"] = round(samples[-1], 6)
+        return result
+
+
+class Metrics:
+    """
+    Реестр метрик: счетчики, датчики и гистограммы длительностей стадий.
+
+    Длительности хранятся в секундах. Датчики - это функции, значение
+    которых читается в момент снятия снимка (например, размер очереди).
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name, fn):
+        """Регистрирует датчик, значение которого вычисляет fn()."""
+        with self._lock:
+            self._gauges[name] = fn
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.window)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """Замеряет длительность блока по монотонным часам."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            gauges = dict(self._gauges)
+            result = {
+                "counters": dict(self._counters),
+                "timings": {name: h.summary() for name, h in self._histograms.items()},
+            }
+        result["gauges"] = {}
+        for name, fn in gauges.items():
+            try:
+                result["gauges"][name] = fn()
+            except Exception:
+                pass
+        return result
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix="screentranslator"):
+        """Снимок метрик в текстовом формате Prometheus."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in snapshot["gauges"].items():
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        for name, summary in snapshot["timings"].items():
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                key = f"p{int(q * 100)}"
+                if key in summary:
+                    lines.append(f'{metric}{{quantile="{q}"}} {summary[key]}')
+            lines.append(f"{metric}_sum {summary['sum']}")
+            lines.append(f"{metric}_count {summary['count']}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Запускает HTTP-сервер с метриками: /metrics (Prometheus) и /metrics.json."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = registry.to_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(registry.snapshot(), ensure_ascii=False).encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Метрики доступны на http://{host}:{port}/metrics")
+        return server
+
+
+# Общий реестр метрик процесса
+metrics = Metrics()
@@ -3,6 +3,104 @@ import cv2
 import mss
 import numpy as np
 
+
+def non_max_suppression(boxes, overlap_threshold=0.7):
+    """
+    Векторизованное подавление вложенных и перекрывающихся рамок (x, y, w, h).
+
+    Перекрытие считается относительно меньшей рамки, поэтому вложенные
+    друг в друга регионы MSER одной буквы схлопываются в самый большой.
+    """
+    if len(boxes) == 0:
+        return boxes.reshape(0, 4)
+
+    x0 = boxes[:, 0].astype(np.float32)
+    y0 = boxes[:, 1].astype(np.float32)
+    x1 = x0 + boxes[:, 2]
+    y1 = y0 + boxes[:, 3]
+    areas = boxes[:, 2].astype(np.float32) * boxes[:, 3]
+
+    # Сначала обрабатываем самые большие рамки
+    order = np.argsort(areas)[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.maximum(0, np.minimum(x1[i], x1[rest]) - np.maximum(x0[i], x0[rest]))
+        h = np.maximum(0, np.minimum(y1[i], y1[rest]) - np.maximum(y0[i], y0[rest]))
+        overlap = (w * h) / np.minimum(areas[i], areas[rest])
+        order = rest[overlap < overlap_threshold]
+    return boxes[keep]
+
+
+def group_into_lines(boxes, gap_factor=1.5, min_boxes=2):
+    """
+    Объединяет рамки символов в рамки строк текста.
+
+    Рамки попадают в одну строку, если они перекрываются по вертикали
+    больше чем на половину высоты и расстояние между ними по горизонтали
+    не больше gap_factor высот. Строки из меньше чем min_boxes символов
+    отбрасываются как шум.
+    """
+    lines = [] # [x0, y0, x1, y1, число рамок]
+    for x, y, w, h in sorted(boxes.tolist(), key=lambda b: b[0]):
+        x1, y1 = x + w, y + h
+        for line in lines:
+            overlap = min(y1, line[3]) - max(y, line[1])
+            if overlap < 0.5 * min(h, line[3] - line[1]):
+                continue
+            if x - line[2] > gap_factor * max(h, line[3] - line[1]):
+                continue
+            line[0], line[1] = min(line[0], x), min(line[1], y)
+            line[2], line[3] = max(line[2], x1), max(line[3], y1)
+            line[4] += 1
+            break
+        else:
+            lines.append([x, y, x1, y1, 1])
+
+    return [(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1, count in lines if count >= min_boxes]
+
+
+class TextLocalizer:
+    """
+    Находит строки текста на Ч/Б изображении с помощью MSER.
+
+    Используется перед OCR: Tesseract получает только рамки строк, а
+    кадр без текстоподобных регионов не распознается вовсе.
+    """
+
+    def __init__(self, min_height=6, max_height=80, max_aspect=4.0, padding=4, delta=5):
+        self.min_height = min_height # Допустимая высота символа, пикс.
+        self.max_height = max_height
+        self.max_aspect = max_aspect # Максимальное отношение ширины символа к высоте
+        self.padding = padding # Отступ вокруг найденной строки
+        self.mser = cv2.MSER_create(delta=delta, min_area=min_height * 2, max_area=max_height * max_height)
+
+    def detect_boxes(self, gray):
+        """Рамки (x, y, w, h) регионов, похожих на символы."""
+        _, bboxes = self.mser.detectRegions(gray)
+        if len(bboxes) == 0:
+            return np.empty((0, 4), dtype=np.int32)
+        bboxes = np.asarray(bboxes)
+        w, h = bboxes[:, 2], bboxes[:, 3]
+        mask = (h >= self.min_height) & (h <= self.max_height) & (w <= h * self.max_aspect)
+        return non_max_suppression(bboxes[mask])
+
+    def locate(self, gray):
+        """Рамки (x, y, w, h) строк текста с отступами, обрезанные по границам изображения."""
+        height, width = gray.shape[:2]
+        lines = []
+        for x, y, w, h in group_into_lines(self.detect_boxes(gray)):
+            x0 = max(0, x - self.padding)
+            y0 = max(0, y - self.padding)
+            x1 = min(width, x + w + self.padding)
+            y1 = min(height, y + h + self.padding)
+            lines.append((x0, y0, x1 - x0, y1 - y0))
+        # Сверху вниз, чтобы текст склеивался в порядке чтения
+        return sorted(lines, key=lambda b: (b[1], b[0]))
+
+
 def detect_text_with_mser():
     """
     Делает скриншот, находит текстовые блоки с помощью MSER, выводит их координаты
@@ -21,29 +119,26 @@ def detect_text_with_mser():
         # mss захватывает в BGRA, поэтому конвертируем в BGR для отображения
         # и в серый для анализа.
         img_bgra = np.array(sct_img)
-        
+
         # Конвертируем в оттенки серого, так как MSER работает с одноканальными изображениями
         gray = cv2.cvtColor(img_bgra, cv2.COLOR_BGRA2GRAY)
 
     print("Ищу текстовые блоки с помощью MSER...")
-    
-    # Создаем объект MSER. Параметры можно тонко настраивать,
-    # но для начала используем значения по умолчанию.
-    mser = cv2.MSER_create()
-    
-    # Находим регионы на изображении.
-    # detectRegions возвращает список контуров регионов и их ограничивающие рамки
-    regions, bboxes = mser.detectRegions(gray)
-
-    print(f"\nНайдено {len(bboxes)} потенциальных текстовых блоков.")
-    print("Координаты (x, y, ширина, высота):")
-    
+
+    localizer = TextLocalizer()
+    bboxes = localizer.detect_boxes(gray)
+    lines = localizer.locate(gray)
+
+    print(f"\nНайдено {len(bboxes)} потенциальных символов и {len(lines)} строк текста.")
+    print("Координаты строк (x, y, ширина, высота):")
+
     # Проходим по всем найденным рамкам и выводим их координаты
-    for i, box in enumerate(bboxes):
-        x, y, w, h = box
-        print(f"  Блок {i+1}: ({x}, {y}, {w}, {h})")
-        # Рисуем прямоугольник вокруг каждого найденного блока на цветном изображении
-        cv2.rectangle(img_bgra, (x, y), (x + w, y + h), (0, 255, 0), 2)
+    for x, y, w, h in bboxes:
+        # Рисуем прямоугольник вокруг каждого найденного символа на цветном изображении
+        cv2.rectangle(img_bgra, (x, y), (x + w, y + h), (0, 255, 0), 1)
+    for i, (x, y, w, h) in enumerate(lines):
+        print(f"  Строка {i+1}: ({x}, {y}, {w}, {h})")
+        cv2.rectangle(img_bgra, (x, y), (x + w, y + h), (0, 0, 255), 2)
 
     # Показываем изображение с выделенными блоками
     window_name = "Обнаруженные текстовые блоки (MSER)"
@@ -55,4 +150,4 @@ def detect_text_with_mser():
     cv2.destroyAllWindows()
 
 if __name__ == '__main__':
-    detect_text_with_mser()
\ No newline at end of file
+    detect_text_with_mser()
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+# Режимы сегментации страницы Tesseract (tesserocr.PSM)
+PSM_AUTO = 3
+PSM_SINGLE_BLOCK = 6
+PSM_SINGLE_LINE = 7
+
+# Символы английских субтитров: без "|" и прочего, что Tesseract путает с I и l
+ENGLISH_WHITELIST = (
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+    " .,!?'\"-:;()…%&/"
+)
+
+
+@dataclass(frozen=True)
+class OcrPreset:
+    """
+    Предобработка кадра перед OCR и соответствующие настройки Tesseract.
+
+    Игровой текст часто светлый на темном фоне и с низким контрастом.
+    Tesseract лучше всего распознает темный текст на светлом фоне после
+    бинаризации, а с заранее известной структурой (строка или блок)
+    не тратит время на анализ макета страницы.
+    """
+    invert: str = "none" # "none", "auto" (светлый текст на темном фоне инвертируется) или "always"
+    threshold: str = "none" # "none", "otsu" или "adaptive"
+    upscale: int = 1 # Целочисленное увеличение перед бинаризацией
+    psm: int = None # Режим сегментации для всей области (None - по умолчанию Tesseract)
+    line_psm: int = None # Режим сегментации для строк, найденных MSER
+    whitelist: str = None # Допустимые символы
+
+    @property
+    def is_identity(self):
+        return self.invert == "none" and self.threshold == "none" and self.upscale == 1
+
+    def configure(self, api, lines=False):
+        """Настраивает экземпляр tesserocr.PyTessBaseAPI."""
+        psm = self.line_psm if lines else self.psm
+        if psm is not None:
+            api.SetPageSegMode(psm)
+        if self.whitelist:
+            api.SetVariable("tessedit_char_whitelist", self.whitelist)
+
+    def apply(self, gray):
+        """Обработанный Ч/Б кадр (uint8); исходный не меняется."""
+        if self.is_identity:
+            return gray
+
+        image = gray
+        if self.upscale > 1:
+            image = cv2.resize(image, None, fx=self.upscale, fy=self.upscale, interpolation=cv2.INTER_CUBIC)
+
+        invert = self.invert == "always"
+        if self.invert == "auto":
+            # Текст занимает меньшую часть области: если фон темный, текст светлый
+            invert = np.median(image) < 128
+        if invert:
+            image = cv2.bitwise_not(image)
+
+        if self.threshold == "otsu":
+            _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        elif self.threshold == "adaptive":
+            image = cv2.adaptiveThreshold(
+                image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 10
+            )
+        return np.ascontiguousarray(image)
+
+
+PRESETS = {
+    # Как раньше: кадр без изменений, сегментация по умолчанию
+    "raw": OcrPreset(),
+    "gray": OcrPreset(invert="auto", psm=PSM_SINGLE_BLOCK, line_psm=PSM_SINGLE_LINE),
+    "otsu": OcrPreset(invert="auto", threshold="otsu", psm=PSM_SINGLE_BLOCK, line_psm=PSM_SINGLE_LINE),
+    "otsu_en": OcrPreset(invert="auto", threshold="otsu", psm=PSM_SINGLE_BLOCK, line_psm=PSM_SINGLE_LINE,
+                         whitelist=ENGLISH_WHITELIST),
+    "adaptive": OcrPreset(invert="auto", threshold="adaptive", psm=PSM_SINGLE_BLOCK, line_psm=PSM_SINGLE_LINE),
+    "otsu_x2": OcrPreset(invert="auto", threshold="otsu", upscale=2, psm=PSM_SINGLE_BLOCK,
+                         line_psm=PSM_SINGLE_LINE),
+}
+
+
+def get_preset(preset):
+    """Предустановка по имени или сам объект OcrPreset."""
+    if isinstance(preset, OcrPreset):
+        return preset
+    try:
+        return PRESETS[preset]
+    except KeyError:
+        raise ValueError(f"Неизвестная предустановка OCR: {preset}. Доступны: {', '.join(PRESETS)}")
@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+import wx
+
+
+@dataclass
+class OverlayMask:
+    """Известное изображение окна OSD поверх снимка."""
+    box: tuple # (x0, y0, x1, y1) окна внутри снимка
+    alpha: float # Непрозрачность окна
+    glyphs: object # Маска пикселей текста окна (uint8, 255 - текст)
+
+
+def render_glyph_mask(size, font, text, origin, dilate=2):
+    """
+    Рисует текст окна вне экрана тем же шрифтом и в той же позиции и
+    возвращает маску его пикселей. Маска расширяется на dilate пикселей,
+    чтобы покрыть сглаживание краев букв.
+    """
+    width, height = size
+    bitmap = wx.Bitmap(width, height)
+    dc = wx.MemoryDC(bitmap)
+    dc.SetBackground(wx.Brush(wx.Colour("black")))
+    dc.Clear()
+    dc.SetFont(font)
+    dc.SetTextForeground(wx.Colour("white"))
+    dc.DrawText(text, *origin)
+    dc.SelectObject(wx.NullBitmap)
+
+    rgb = np.frombuffer(bytes(bitmap.ConvertToImage().GetData()), dtype=np.uint8).reshape(height, width, 3)
+    mask = np.where(rgb[:, :, 0] > 0, 255, 0).astype(np.uint8)
+    if dilate:
+        mask = cv2.dilate(mask, np.ones((2 * dilate + 1, 2 * dilate + 1), np.uint8))
+    return mask
+
+
+def unblend(image, masks):
+    """
+    Восстанавливает в Ч/Б снимке (на месте) то, что находится под окнами OSD.
+
+    Фон окна черный, поэтому под фоном снимок равен (1 - alpha) * исходный:
+    достаточно разделить на (1 - alpha). Под буквами окна исходные пиксели
+    потеряны, они заполняются по соседним (cv2.inpaint).
+    """
+    for mask in masks:
+        x0, y0, x1, y1 = mask.box
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, image.shape[1]), min(y1, image.shape[0])
+        if x1 <= x0 or y1 <= y0:
+            continue
+        area = image[y0:y1, x0:x1]
+        gain = 1.0 / (1.0 - mask.alpha)
+        area[:] = cv2.convertScaleAbs(area, alpha=gain)
+
+        glyphs = mask.glyphs[y0 - mask.box[1]:y1 - mask.box[1], x0 - mask.box[0]:x1 - mask.box[0]]
+        if glyphs.any():
+            area[:] = cv2.inpaint(area, glyphs, 3, cv2.INPAINT_TELEA)
@@ -0,0 +1,764 @@
+import os
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from change_detector import ChangeDetector
+from translation_memory import TranslationMemory
+from fuzzy_index import FuzzyIndex
+from glossary import Glossary
+from mser_detector import TextLocalizer
+from ocr_preprocess import get_preset
+from metrics import metrics as default_metrics
+from segments import split_segments
+from stabilizer import TextStabilizer
+from regions import union_area
+from translation_service import TranslationTimeout
+
+
+class LatestQueue:
+    """
+    Очередь "побеждает последний": новый элемент вытесняет еще не
+    обработанный старый, поэтому потребитель всегда берет самый свежий.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._has_item = False
+        self.dropped = 0 # Сколько элементов было вытеснено без обработки
+
+    def put(self, item):
+        with self._cond:
+            if self._has_item:
+                self.dropped += 1
+            self._item = item
+            self._has_item = True
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._has_item, timeout):
+                raise queue.Empty
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def qsize(self):
+        with self._cond:
+            return int(self._has_item)
+
+
+class KeyedLatestQueue:
+    """
+    Очередь "побеждает последний" с отдельным слотом на каждый ключ (область).
+
+    get() выдает элемент с наибольшим приоритетом среди ключей, которые
+    сейчас не обрабатываются, и помечает ключ занятым до вызова done().
+    Так одну область никогда не обрабатывают два потока одновременно.
+    """
+
+    def __init__(self, priority=None):
+        self._cond = threading.Condition()
+        self._items = {} # ключ -> (элемент, время постановки)
+        self._busy = set()
+        self._closed = False
+        # По умолчанию первым выдается самый давно ожидающий элемент
+        self._priority = priority or (lambda key, waited: waited)
+        self.dropped = 0
+
+    def put(self, key, item):
+        with self._cond:
+            if key in self._items:
+                self.dropped += 1
+                enqueued_at = self._items[key][1]
+            else:
+                enqueued_at = time.monotonic()
+            self._items[key] = (item, enqueued_at)
+            self._cond.notify()
+
+    def _ready_keys(self):
+        return [key for key in self._items if key not in self._busy]
+
+    def get(self, timeout=None):
+        """Возвращает (ключ, элемент) или None, если очередь закрыта."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or self._ready_keys(), timeout):
+                raise queue.Empty
+            if self._closed:
+                return None
+            now = time.monotonic()
+            key = max(self._ready_keys(), key=lambda k: self._priority(k, now - self._items[k][1]))
+            item, _ = self._items.pop(key)
+            self._busy.add(key)
+            return key, item
+
+    def done(self, key):
+        with self._cond:
+            self._busy.discard(key)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+
+@dataclass
+class Frame:
+    """Ч/Б снимок объединенной области экрана (массив NumPy)."""
+    image: object
+    captured_at: float = field(default_factory=time.monotonic)
+    seq: int = 0 # Порядковый номер, присваивается стадией сравнения
+    ring: object = None # FrameRing, которому принадлежит буфер снимка
+    generation: int = 0 # Поколение буфера в кольце
+
+    def is_intact(self):
+        """Буфер снимка еще не переиспользован для более нового снимка."""
+        return self.ring is None or self.ring.is_valid(self.generation)
+
+
+@dataclass
+class RegionFrame:
+    """Часть снимка, относящаяся к одной области (представление без копирования)."""
+    region: str
+    seq: int
+    image: object
+    captured_at: float
+    source: Frame = None # Исходный снимок, которому принадлежит буфер
+    change: object = None # ChangeResult детектора изменений
+
+
+@dataclass
+class OcrWord:
+    """Распознанное слово с уверенностью Tesseract (0-100) и рамкой (x, y, w, h) в координатах области."""
+    text: str
+    confidence: float
+    box: tuple
+    line: int # Номер строки в области
+
+
+@dataclass
+class OcrResult:
+    """Результат распознавания области после отсева неуверенных слов и строк."""
+    text: str
+    words: list = field(default_factory=list) # Оставленные слова (OcrWord)
+    confidence: float = 0.0 # Средняя уверенность по всем словам кадра, с учетом длины слов
+
+
+@dataclass
+class TextJob:
+    """Очищенный распознанный текст, ожидающий перевода."""
+    region: str
+    seq: int
+    text: str
+    captured_at: float
+    words: list = field(default_factory=list) # Слова с уверенностью и рамками (OcrWord)
+    confidence: float = None # Средняя уверенность OCR по кадру
+
+
+@dataclass
+class RegionState:
+    """Состояние конвейера для одной области."""
+    region: object
+    detector: ChangeDetector = field(default_factory=ChangeDetector)
+    latest_seq: int = 0 # Номер последнего изменившегося кадра области
+    last_text: str = None
+    activity: float = 0.0 # Скользящая частота изменений области
+    stabilizer: TextStabilizer = field(default_factory=TextStabilizer)
+    held: TextJob = None # Текст, перевод которого отложен до окончания "печати"
+    ocr_text: str = None # Последний распознанный текст; пишет только стадия OCR
+
+
+def argos_translate(text, from_code, to_code):
+    """Перевод через argostranslate; модуль импортируется при первом вызове."""
+    from argostranslate import translate
+    return translate.translate(text, from_code, to_code)
+
+
+def clean_ocr_text(text):
+    """Исправление и подготовка распознанного текста."""
+    processed_text = text.replace("\n", " ").strip()
+    # Заменяем '1' на 'I', если перед ним не цифра, а после - не цифра и не точка.
+    processed_text = re.sub(r'(?<!\d)1(?![.\d])', 'I', processed_text)
+    processed_text = re.sub(r'(^|\s|[.,!?;()-])([/|])', r'\1I', processed_text)
+    processed_text = re.sub(r'([/|])', 'l', processed_text)
+    return processed_text
+
+
+class Pipeline:
+    """
+    Конвейер сравнение -> OCR -> перевод для нескольких областей экрана.
+
+    Снимок объединенной области режется на области, и для каждой работает
+    свой детектор изменений. Изменившиеся области распознает пул потоков
+    OCR (у каждого свой PyTessBaseAPI - он не потокобезопасен), причем
+    первыми берутся области, которые менялись недавно. Все стадии читают
+    из очередей "побеждает последний", так что OCR следующего кадра идет
+    параллельно с переводом предыдущего, а работа по кадру, который уже
+    вытеснен более новым изменившимся кадром, отменяется.
+
+    Перед OCR строки текста ищутся с помощью MSER, и Tesseract получает
+    только их рамки; если текстоподобных регионов нет, OCR не вызывается.
+    Перевод текста, который появляется посимвольно, откладывается, пока
+    текст не перестанет дописываться.
+
+    Распознавание можно вынести из процесса: recognize_fn(RegionFrame,
+    номер потока) -> OcrResult заменяет локальный Tesseract (см.
+    process_pipeline.OcrProcessPool).
+
+    Методы diff_stage / ocr_stage / translate_stage можно вызывать и
+    синхронно, без потоков.
+    """
+
+    ACTIVITY_DECAY = 0.8
+
+    def __init__(self, frames, regions, on_show, on_hide, on_error=None, is_active=None, on_diff=None,
+                 translation_memory_path="translation_memory.sqlite3",
+                 fuzzy_max_distance=2, ocr_workers=2, use_text_localizer=True,
+                 stable_window=0.6, max_hold=3.0, show_provisional=False,
+                 translate_workers=1, translate_fn=None, translate_batch_fn=None,
+                 metrics=None, from_code="en", to_code="ru", ocr_preset="raw",
+                 ocr_clear_every=0, ocr_recycle_every=0,
+                 translation_memory_bytes=4 * 1024 * 1024, fuzzy_max_entries=256,
+                 translation_retry_delay=1.0,
+                 min_word_confidence=0, min_line_confidence=0, min_frame_confidence=0,
+                 glossary_path=None, recognize_fn=None):
+        self.frames = frames # Входная очередь снимков (LatestQueue)
+        self.ocr_jobs = KeyedLatestQueue(priority=self._ocr_priority)
+        self.text_jobs = KeyedLatestQueue()
+
+        self.regions = {
+            region.name: RegionState(region, stabilizer=TextStabilizer(stable_window, max_hold))
+            for region in regions
+        }
+        self.union = union_area(regions)
+
+        self.on_show = on_show # Вызывается с именем области и переведенным текстом
+        self.on_hide = on_hide # Вызывается с именем области, когда текста в ней нет
+        self.on_error = on_error
+        self.is_active = is_active or (lambda: True)
+        # Вызывается, когда известно, изменился ли текст: False после снимка без изменений,
+        # после OCR - отличается ли текст от прошлого (смена одного фона - не изменение)
+        self.on_diff = on_diff
+        self.show_provisional = show_provisional # Показывать готовые предложения, пока текст печатается
+        self.from_code = from_code
+        self.to_code = to_code
+        self.translate_fn = translate_fn or argos_translate # (текст, из, в) -> перевод
+        self.translate_batch_fn = translate_batch_fn # Список текстов -> список переводов
+        self.translation_retry_delay = translation_retry_delay # Через сколько секунд повторить перевод после таймаута
+        self.translate_workers = max(1, translate_workers)
+
+        self.translation_memory = TranslationMemory(translation_memory_path, max_memory_bytes=translation_memory_bytes)
+        self.fuzzy_index = FuzzyIndex(max_entries=fuzzy_max_entries, max_distance=fuzzy_max_distance)
+        # Словарь терминов с фиксированным переводом (None - не используется)
+        self.glossary = None
+        if glossary_path and os.path.exists(glossary_path):
+            self.glossary = Glossary.load(glossary_path)
+            print(f"Словарь терминов: {len(self.glossary)} записей из {glossary_path}")
+        self._fuzzy_lock = threading.Lock()
+        # У каждого потока OCR свой Tesseract и свой MSER, если распознавание
+        # не вынесено в другие процессы
+        self.ocr_workers = max(1, ocr_workers)
+        self.recognize_fn = recognize_fn
+        self.use_text_localizer = use_text_localizer
+        self.ocr_preset = get_preset(ocr_preset) # Предобработка кадра и режим Tesseract
+        self.ocr_pool = []
+        self.localizers = None
+        if recognize_fn is None:
+            import tesserocr
+            self._tesserocr = tesserocr
+            self.ocr_pool = [self._new_ocr() for _ in range(self.ocr_workers)]
+            if use_text_localizer:
+                self.localizers = [TextLocalizer() for _ in self.ocr_pool]
+        # Долгие сеансы: адаптивный классификатор Tesseract копит состояние,
+        # поэтому его периодически сбрасывают, а экземпляр пересоздают
+        self.ocr_clear_every = ocr_clear_every # Сбрасывать адаптивный классификатор каждые N распознаваний (0 - нет)
+        self.ocr_recycle_every = ocr_recycle_every # Пересоздавать экземпляр Tesseract каждые N распознаваний (0 - нет)
+        self._ocr_uses = [0] * len(self.ocr_pool)
+        # Отсев мусора (текстуры, элементы интерфейса, обрезанные буквы) до перевода
+        self.min_word_confidence = min_word_confidence # Слова с меньшей уверенностью отбрасываются
+        self.min_line_confidence = min_line_confidence # Строки с меньшей средней уверенностью отбрасываются
+        self.min_frame_confidence = min_frame_confidence # Кадр с меньшей средней уверенностью считается пустым
+
+        self.metrics = metrics or default_metrics
+        self.metrics.gauge("capture_queue_depth", self.frames.qsize)
+        self.metrics.gauge("capture_queue_dropped", lambda: self.frames.dropped)
+        self.metrics.gauge("ocr_queue_depth", self.ocr_jobs.qsize)
+        self.metrics.gauge("ocr_queue_dropped", lambda: self.ocr_jobs.dropped)
+        self.metrics.gauge("translate_queue_depth", self.text_jobs.qsize)
+        self.metrics.gauge("translate_queue_dropped", lambda: self.text_jobs.dropped)
+        # Доля попаданий в кэш переводов видна во время сеанса, а не только при завершении
+        for name in self.translation_memory.stats():
+            self.metrics.gauge(f"translation_memory_{name}", lambda name=name: self.translation_memory.stats()[name])
+        self.metrics.gauge("fuzzy_hits", lambda: self.fuzzy_index.hits)
+        self.metrics.gauge("fuzzy_misses", lambda: self.fuzzy_index.misses)
+
+        self._seq = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _ocr_priority(self, name, waited):
+        # Недавно менявшиеся области важнее, но долго ждущие не должны голодать
+        return self.regions[name].activity + waited
+
+    def is_superseded(self, name, seq):
+        """Кадр области устарел: после него уже пришел изменившийся кадр."""
+        return seq < self.regions[name].latest_seq
+
+    # --- Стадии ---
+
+    def diff_stage(self, frame):
+        """Режет снимок на области и возвращает список изменившихся RegionFrame."""
+        self._seq += 1
+        frame.seq = self._seq
+        self.metrics.inc("frames_diffed")
+        changed = []
+        for name, state in self.regions.items():
+            x0, y0, x1, y1 = state.region.box_in(self.union)
+            image = frame.image[y0:y1, x0:x1]
+            with self.metrics.timer("diff"):
+                change = state.detector.update(image)
+            state.activity = state.activity * self.ACTIVITY_DECAY + (1 - self.ACTIVITY_DECAY) * change.changed
+            if not change.changed:
+                self.metrics.inc("diff_skips")
+                continue
+            state.latest_seq = frame.seq
+            changed.append(RegionFrame(
+                region=name, seq=frame.seq, image=image, captured_at=frame.captured_at, source=frame, change=change
+            ))
+        return changed
+
+    def _new_ocr(self):
+        ocr = self._tesserocr.PyTessBaseAPI(lang='eng')
+        self.ocr_preset.configure(ocr, lines=self.use_text_localizer)
+        return ocr
+
+    def _maintain_ocr(self, worker):
+        """Сброс состояния или пересоздание экземпляра Tesseract по счетчику распознаваний."""
+        uses = self._ocr_uses[worker] = self._ocr_uses[worker] + 1
+        ocr = self.ocr_pool[worker]
+        ocr.Clear() # Результаты и изображение последнего распознавания больше не нужны
+        if self.ocr_recycle_every and uses % self.ocr_recycle_every == 0:
+            with self.metrics.timer("ocr_recycle"):
+                ocr.End()
+                self.ocr_pool[worker] = self._new_ocr()
+        elif self.ocr_clear_every and uses % self.ocr_clear_every == 0:
+            ocr.ClearAdaptiveClassifier()
+            self.metrics.inc("ocr_classifier_clears")
+
+    def recognize_region(self, region_frame, worker=0):
+        """Распознает область и обслуживает экземпляр Tesseract после распознавания."""
+        result = self.recognize(region_frame, worker)
+        self._maintain_ocr(worker)
+        return result
+
+    def recognize(self, region_frame, worker=0):
+        """
+        Распознает текст области; при включенном MSER - только в рамках строк.
+        Возвращает OcrResult или None, если буфер кадра успели переиспользовать.
+        """
+        ocr = self.ocr_pool[worker]
+        image = region_frame.image
+        height, width = image.shape
+        # Единственная копия кадра: tesserocr принимает только bytes
+        data = image.tobytes()
+        if region_frame.source is not None and not region_frame.source.is_intact():
+            self.metrics.inc("frames_overwritten")
+            return None
+        gray = np.frombuffer(data, dtype=np.uint8).reshape(height, width)
+
+        lines = None
+        if self.localizers is not None:
+            with self.metrics.timer("mser"):
+                lines = self.localizers[worker].locate(gray)
+            if not lines:
+                self.metrics.inc("ocr_skipped_no_text")
+                return OcrResult(text="")
+
+        if self.ocr_preset.is_identity:
+            ocr.SetImageBytes(data, width, height, 1, width)
+        else:
+            with self.metrics.timer("preprocess"):
+                processed = self.ocr_preset.apply(gray)
+            ocr.SetImageBytes(processed.tobytes(), processed.shape[1], processed.shape[0], 1, processed.shape[1])
+
+        self.metrics.inc("ocr_calls")
+        scale = self.ocr_preset.upscale # Рамки строк найдены на исходном кадре
+        words = []
+        with self.metrics.timer("ocr"):
+            if lines is None:
+                words, _ = self._read_words(ocr, scale)
+            else:
+                line = 0
+                for x, y, w, h in lines:
+                    ocr.SetRectangle(x * scale, y * scale, w * scale, h * scale)
+                    line_words, line = self._read_words(ocr, scale, line)
+                    words.extend(line_words)
+        return self._filter_words(words)
+
+    def _read_words(self, ocr, scale, line=0):
+        """
+        Слова последнего распознавания с уверенностью и рамками.
+        Возвращает (слова, номер следующей строки).
+        """
+        ocr.Recognize()
+        iterator = ocr.GetIterator()
+        if iterator is None:
+            return [], line
+        RIL = self._tesserocr.RIL
+        words = []
+        for word in self._tesserocr.iterate_level(iterator, RIL.WORD):
+            text = word.GetUTF8Text(RIL.WORD)
+            box = word.BoundingBox(RIL.WORD)
+            if text and text.strip() and box is not None:
+                x0, y0, x1, y1 = (value // scale for value in box)
+                words.append(OcrWord(text.strip(), max(0.0, word.Confidence(RIL.WORD)), (x0, y0, x1 - x0, y1 - y0), line))
+            # Без MSER строки различаются по разметке самого Tesseract
+            if word.IsAtFinalElement(RIL.TEXTLINE, RIL.WORD):
+                line += 1
+        return words, line
+
+    def _filter_words(self, words):
+        """Отбрасывает неуверенные слова и строки; кадр с низкой средней уверенностью считается пустым."""
+        if not words:
+            return OcrResult(text="")
+        total_chars = sum(len(word.text) for word in words)
+        confidence = sum(word.confidence * len(word.text) for word in words) / total_chars
+        if confidence < self.min_frame_confidence:
+            self.metrics.inc("ocr_rejected_low_confidence")
+            return OcrResult(text="", confidence=confidence)
+
+        by_line = {}
+        for word in words:
+            if word.confidence >= self.min_word_confidence:
+                by_line.setdefault(word.line, []).append(word)
+        kept = []
+        texts = []
+        for line_words in by_line.values():
+            line_chars = sum(len(word.text) for word in line_words)
+            line_confidence = sum(word.confidence * len(word.text) for word in line_words) / line_chars
+            if line_confidence < self.min_line_confidence:
+                continue
+            kept.extend(line_words)
+            texts.append(" ".join(word.text for word in line_words))
+        if len(kept) < len(words):
+            self.metrics.inc("ocr_words_dropped", len(words) - len(kept))
+        return OcrResult(text="\n".join(texts), words=kept, confidence=confidence)
+
+    def ocr_stage(self, region_frame, worker=0):
+        """Распознает текст области и возвращает TextJob (с пустым текстом, если текста нет) или None."""
+        name = region_frame.region
+        if self.is_superseded(name, region_frame.seq):
+            self.metrics.inc("stale_dropped")
+            return None
+
+        result = (self.recognize_fn or self.recognize_region)(region_frame, worker)
+        if result is None:
+            self._report_text(name, "")
+            return None
+
+        # Проверка и обработка текста
+        text = result.text
+        if not text.strip() or len(text.strip()) < 3:
+            self.metrics.inc("ocr_empty")
+            self._report_text(name, "")
+            # Пустая задача: состояние области сбрасывает стадия перевода, которая
+            # одна обрабатывает эту область (очередь text_jobs не выдает ключ двум потокам)
+            return TextJob(region=name, seq=region_frame.seq, text="", captured_at=region_frame.captured_at)
+
+        with self.metrics.timer("cleanup"):
+            text = clean_ocr_text(text)
+        self._report_text(name, text)
+        return TextJob(
+            region=name, seq=region_frame.seq, text=text, captured_at=region_frame.captured_at,
+            words=result.words, confidence=result.confidence,
+        )
+
+    def _report_text(self, name, text):
+        """Сообщает планировщику захвата, изменился ли текст области."""
+        state = self.regions[name]
+        changed = text != state.ocr_text
+        state.ocr_text = text
+        if self.on_diff is not None:
+            self.on_diff(changed)
+
+    def cached_translation(self, segment):
+        """Перевод из кэша: сначала точное совпадение в памяти переводов, затем почти такая же недавняя строка."""
+        translated_text = self.translation_memory.get(segment, self.from_code, self.to_code)
+        with self._fuzzy_lock:
+            if translated_text is not None:
+                self.fuzzy_index.add(segment, translated_text)
+            else:
+                translated_text = self.fuzzy_index.lookup(segment)
+        return translated_text
+
+    def _translate_uncached(self, segments):
+        """Переводит предложения одним пакетом и сохраняет их в кэш."""
+        self.metrics.inc("translations", len(segments))
+        self.metrics.inc("translation_batches")
+        with self.metrics.timer("nmt"):
+            if self.translate_batch_fn is not None:
+                translated = self.translate_batch_fn(segments)
+            else:
+                translated = [self.translate_fn(segment, self.from_code, self.to_code) for segment in segments]
+
+        for segment, translated_text in zip(segments, translated):
+            self.translation_memory.put(segment, self.from_code, self.to_code, translated_text)
+            with self._fuzzy_lock:
+                self.fuzzy_index.add(segment, translated_text)
+        return translated
+
+    def _protect(self, segment):
+        """Предложение с заменителями вместо терминов словаря и переводы этих терминов."""
+        if self.glossary is None:
+            return segment, []
+        return self.glossary.protect(segment)
+
+    def translate(self, text):
+        """
+        Переводит текст по предложениям. Каждое предложение кэшируется
+        отдельно, поэтому при дописывании текста в диалоговое окно
+        переводятся только новые или изменившиеся предложения, причем
+        все они отправляются переводчику одним пакетом.
+
+        Термины словаря заменяются заменителями до перевода и кэша;
+        предложение, целиком состоящее из терминов, переводчику не отправляется.
+        """
+        segments = split_segments(text)
+        self.metrics.inc("segments", len(segments))
+        protected = {segment: self._protect(segment) for segment in segments}
+
+        translated = {}
+        missing = []
+        for key, renderings in protected.values():
+            if key in translated or key in missing:
+                continue
+            if renderings and Glossary.is_covered(key):
+                self.metrics.inc("glossary_covered")
+                translated[key] = key
+                continue
+            value = self.cached_translation(key)
+            if value is None:
+                missing.append(key)
+            else:
+                translated[key] = value
+        if missing:
+            translated.update(zip(missing, self._translate_uncached(missing)))
+
+        results = {}
+        retry = []
+        for segment, (key, renderings) in protected.items():
+            value = translated[key]
+            if renderings:
+                value = Glossary.restore(value, renderings)
+                if value is None:
+                    # Модель потеряла заменитель - переводим предложение как есть
+                    retry.append(segment)
+                    continue
+            results[segment] = value
+        if retry:
+            self.metrics.inc("glossary_restore_failed", len(retry))
+            for segment in retry:
+                results[segment] = self.cached_translation(segment)
+            uncached = [segment for segment in retry if results[segment] is None]
+            if uncached:
+                results.update(zip(uncached, self._translate_uncached(uncached)))
+        return " ".join(results[segment] for segment in segments)
+
+    def _cached_segment(self, segment):
+        """Перевод предложения из кэша с учетом словаря или None."""
+        key, renderings = self._protect(segment)
+        if renderings and Glossary.is_covered(key):
+            return Glossary.restore(key, renderings)
+        translated_text = self.cached_translation(key)
+        if translated_text is None or not renderings:
+            return translated_text
+        return Glossary.restore(translated_text, renderings)
+
+    def _provisional_translation(self, text):
+        """Перевод уже законченных предложений, если все они есть в кэше."""
+        parts = []
+        for segment in split_segments(text)[:-1]: # Последнее предложение еще печатается
+            translated_text = self._cached_segment(segment)
+            if translated_text is None:
+                return None
+            parts.append(translated_text)
+        return " ".join(parts) or None
+
+    def _hold(self, job, wait):
+        """Откладывает перевод и через wait секунд возвращает задачу в очередь."""
+        state = self.regions[job.region]
+        state.held = job
+        self.metrics.inc("stabilizer_holds")
+
+        if self._threads:
+            def release():
+                # Задачу могли уже заменить более новой, в том числе еще ждущей в
+                # очереди: ее нельзя вытеснять старым отложенным текстом
+                if state.held is job and job.seq >= state.latest_seq and not self._stop.is_set():
+                    self.text_jobs.put(job.region, job)
+            timer = threading.Timer(wait, release)
+            timer.daemon = True
+            timer.start()
+
+        if self.show_provisional:
+            provisional = self._provisional_translation(job.text)
+            if provisional is not None:
+                self.on_show(job.region, provisional)
+
+    def release_held(self, now=None):
+        """Для синхронного режима: переводит отложенный текст, который уже устоялся."""
+        for state in self.regions.values():
+            if state.held is not None:
+                self.translate_stage(state.held, now)
+
+    def translate_stage(self, job, now=None):
+        """Переводит текст и отправляет результат, если он еще актуален."""
+        state = self.regions[job.region]
+        if self.is_superseded(job.region, job.seq):
+            self.metrics.inc("stale_dropped")
+            return None
+        if not job.text:
+            # Текст исчез: окно скрывается, отложенный перевод отменяется
+            state.last_text = None
+            state.held = None
+            state.stabilizer.reset()
+            self.on_hide(job.region)
+            return None
+        if job.text == state.last_text:
+            return None
+
+        wait = state.stabilizer.update(job.text, time.monotonic() if now is None else now)
+        if wait > 0:
+            self._hold(job, wait)
+            return None
+        state.held = None
+
+        try:
+            with self.metrics.timer("translate"):
+                translated_text = self.translate(job.text)
+        except TranslationTimeout as e:
+            # На экране остается прежний перевод, текст переводится повторно чуть позже
+            print(f"Перевод не успел: {e}")
+            self.metrics.inc("translation_timeouts")
+            self._hold(job, self.translation_retry_delay)
+            return None
+        except Exception as e:
+            print(f"Ошибка перевода: {e}")
+            return None
+
+        # Пока шел перевод, мог появиться более новый текст
+        if self.is_superseded(job.region, job.seq):
+            self.metrics.inc("stale_dropped")
+            return None
+
+        state.last_text = job.text
+        self.on_show(job.region, translated_text)
+        self.metrics.inc("shown")
+        self.metrics.observe("capture_to_show", time.monotonic() - job.captured_at)
+        return translated_text
+
+    def warm_up(self):
+        """
+        Прогревает Tesseract и переводчик пустым распознаванием и пробным
+        переводом, чтобы первый настоящий текст не ждал загрузки моделей.
+        """
+        width, height = 64, 32
+        blank = bytes(width * height)
+        with self.metrics.timer("warm_up_ocr"):
+            for ocr in self.ocr_pool:
+                ocr.SetImageBytes(blank, width, height, 1, width)
+                ocr.GetUTF8Text()
+        with self.metrics.timer("warm_up_translate"):
+            try:
+                if self.translate_batch_fn is not None:
+                    self.translate_batch_fn(["Hello."])
+                else:
+                    self.translate_fn("Hello.", self.from_code, self.to_code)
+            except TranslationTimeout as e:
+                # Сетевой переводчик может быть еще недоступен; это не повод останавливаться
+                print(f"Прогрев переводчика: {e}")
+
+    # --- Потоки ---
+
+    def _run_thread(self, name, loop, *args):
+        print(f"Стадия '{name}' запущена.")
+        try:
+            loop(*args)
+        except Exception as e:
+            print(f"Критическая ошибка в стадии '{name}': {e}")
+            if self.on_error is not None:
+                self.on_error(e)
+        print(f"Стадия '{name}' завершена.")
+
+    def _diff_loop(self):
+        while not self._stop.is_set():
+            try:
+                frame = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # None в очереди - сигнал завершения
+            if frame is None:
+                break
+            if not self.is_active():
+                continue
+            changed = self.diff_stage(frame)
+            if not changed and self.on_diff is not None:
+                self.on_diff(False)
+            for region_frame in changed:
+                self.ocr_jobs.put(region_frame.region, region_frame)
+
+    def _keyed_loop(self, source, handler, sink=None):
+        while not self._stop.is_set():
+            try:
+                entry = source.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if entry is None:
+                break
+            key, item = entry
+            try:
+                result = handler(item)
+            finally:
+                source.done(key)
+            if result is not None and sink is not None:
+                sink.put(key, result)
+
+    def start(self):
+        threads = [("сравнение", self._diff_loop)]
+        for i in range(self.ocr_workers):
+            handler = lambda region_frame, worker=i: self.ocr_stage(region_frame, worker)
+            threads.append((f"OCR {i + 1}", self._keyed_loop, self.ocr_jobs, handler, self.text_jobs))
+        for i in range(self.translate_workers):
+            threads.append((f"перевод {i + 1}", self._keyed_loop, self.text_jobs, self.translate_stage))
+
+        for name, loop, *args in threads:
+            thread = threading.Thread(target=self._run_thread, args=(name, loop, *args), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self.frames.put(None)
+        self.ocr_jobs.close()
+        self.text_jobs.close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        print(f"Память переводов: {self.translation_memory.stats()}")
+        print(f"Нечеткий поиск: попаданий {self.fuzzy_index.hits}, промахов {self.fuzzy_index.misses}")
+        print(f"Метрики: {self.metrics.snapshot()['counters']}")
+        self.translation_memory.close()
+        for ocr in self.ocr_pool:
+            ocr.End()
@@ -0,0 +1,181 @@
+import multiprocessing as mp
+import queue
+import sys
+import threading
+import types
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from capture import FrameRing
+from pipeline import Pipeline, LatestQueue, Frame, RegionFrame
+
+
+class SharedFrameRing(FrameRing):
+    """
+    Кольцо буферов снимков в общей памяти (multiprocessing.shared_memory).
+
+    Основной процесс пишет снимки прямо в общую память, а процессы OCR
+    читают их по номеру поколения, без сериализации изображений.
+    """
+
+    def __init__(self, shape, slots, name=None):
+        frames_bytes = slots * int(np.prod(shape))
+        owners_offset = (frames_bytes + 7) // 8 * 8 # Выравнивание для int64
+        size = owners_offset + slots * 8
+        self._creator = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self._creator, size=size)
+        storage = np.ndarray((slots, *shape), dtype=np.uint8, buffer=self.shm.buf)
+        owners = np.ndarray((slots,), dtype=np.int64, buffer=self.shm.buf, offset=owners_offset)
+        if self._creator:
+            owners[:] = 0
+        self.slots = slots
+        super().__init__(shape, slots, storage=storage, owners=owners)
+
+    def spec(self):
+        """Параметры для подключения к кольцу из другого процесса."""
+        return {"shape": self.shape, "slots": self.slots, "name": self.shm.name}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec["shape"], spec["slots"], name=spec["name"])
+
+    def close(self):
+        # Представления NumPy должны исчезнуть раньше, чем закроется общая память
+        self._buffers = []
+        self._owners = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # На буфер еще ссылаются снимки; память освободится вместе с процессом
+            pass
+        if self._creator:
+            self.shm.unlink()
+
+
+@contextmanager
+def _without_main_module():
+    """
+    spawn выполняет в дочернем процессе главный модуль родителя, а это
+    start.py с wx и pynput. Процессам OCR он не нужен: на время запуска
+    главный модуль подменяется пустым, и дочерний процесс импортирует
+    только process_pipeline и его зависимости.
+    """
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+def _ocr_worker_main(ring_spec, regions, jobs, results, ocr_options):
+    """Точка входа процесса OCR: свой Tesseract и MSER, снимки - из общей памяти."""
+    ring = SharedFrameRing.attach(ring_spec)
+    try:
+        pipeline = Pipeline(
+            frames=LatestQueue(),
+            regions=regions,
+            on_show=lambda region, text: None,
+            on_hide=lambda region: None,
+            translate_fn=lambda text, from_code, to_code: text, # Перевод идет в основном процессе
+            translation_memory_path=":memory:",
+            ocr_workers=1,
+            **ocr_options,
+        )
+        pipeline.warm_up()
+    except Exception as e:
+        results.put(("error", str(e)))
+        ring.close()
+        return
+
+    results.put(("ready", None))
+    frame = region_frame = None
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        region, seq, generation, captured_at = job
+        frame = Frame(image=ring.view(generation), captured_at=captured_at, ring=ring, generation=generation)
+        x0, y0, x1, y1 = pipeline.regions[region].region.box_in(pipeline.union)
+        region_frame = RegionFrame(
+            region=region, seq=seq, image=frame.image[y0:y1, x0:x1], captured_at=captured_at, source=frame
+        )
+        try:
+            # Снимок, перезаписанный за время ожидания, распознавание отбросит само
+            results.put(("result", pipeline.recognize_region(region_frame)))
+        except Exception as e:
+            results.put(("error", str(e)))
+
+    frame = region_frame = None # Представления общей памяти - до ее закрытия
+    for ocr in pipeline.ocr_pool:
+        ocr.End()
+    ring.close()
+
+
+class OcrProcessPool:
+    """
+    Пул процессов OCR: у каждого свой экземпляр Tesseract, и распознавание
+    не делит GIL с GUI, сравнением кадров и переводом.
+
+    Процессы читают снимки из SharedFrameRing по номеру поколения, в
+    очередь уходят только имя области, номер поколения и время снимка, а
+    обратно - OcrResult. Поток OCR конвейера с номером i работает со своим
+    процессом i, поэтому recognize() можно передать конвейеру как recognize_fn.
+    ocr_options - параметры распознавания Pipeline (сериализуются pickle).
+    """
+
+    def __init__(self, ring, regions, workers=2, ocr_options=None):
+        self.ring = ring
+        context = mp.get_context("spawn")
+        self._jobs = [context.Queue() for _ in range(workers)]
+        self._results = [context.Queue() for _ in range(workers)]
+        self._processes = [
+            context.Process(
+                target=_ocr_worker_main,
+                args=(ring.spec(), regions, jobs, results, dict(ocr_options or {})),
+                daemon=True,
+            )
+            for jobs, results in zip(self._jobs, self._results)
+        ]
+
+    def __len__(self):
+        return len(self._processes)
+
+    def _receive(self, worker):
+        """Ответ процесса; ошибка, если процесс завершился."""
+        while True:
+            try:
+                kind, payload = self._results[worker].get(timeout=0.5)
+            except queue.Empty:
+                if not self._processes[worker].is_alive():
+                    raise RuntimeError(f"Процесс OCR {worker + 1} завершился")
+                continue
+            if kind == "error":
+                raise RuntimeError(f"Процесс OCR {worker + 1}: {payload}")
+            if kind == "result":
+                return payload
+
+    def start(self):
+        """
+        Запускает процессы; Tesseract в них загружается параллельно с моделью
+        перевода, а ошибка загрузки придет с первым распознаванием.
+        """
+        with _without_main_module():
+            for process in self._processes:
+                process.start()
+
+    def recognize(self, region_frame, worker=0):
+        """Распознает область в процессе worker; возвращает OcrResult или None."""
+        source = region_frame.source
+        self._jobs[worker].put((region_frame.region, region_frame.seq, source.generation, region_frame.captured_at))
+        return self._receive(worker)
+
+    def stop(self):
+        for jobs in self._jobs:
+            jobs.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+
+import cv2
+import mss
+import numpy as np
+
+from mser_detector import TextLocalizer
+
+
+class RegionDiscovery:
+    """
+    Фоновый поиск области субтитров на всем экране.
+
+    Редко делает уменьшенный снимок всего монитора, находит строки текста
+    с помощью MSER и накапливает "тепловую карту" по сетке ячеек: ячейка
+    набирает очки, когда в ней есть строка текста и ее содержимое
+    изменилось с прошлого прохода. Неподвижные надписи интерфейса
+    (меню, счетчики) так не набирают очков, а субтитры - меняющийся текст
+    на одном и том же месте - набирают. Самый "горячий" связный участок
+    предлагается как область распознавания.
+
+    Проход занимает не больше cpu_budget процессорного времени: если
+    проход оказался дорогим, пауза до следующего увеличивается.
+    """
+
+    def __init__(self, scale=0.5, interval=5.0, cpu_budget=0.02, cell=8, decay=0.9,
+                 min_score=2.0, padding=12, monitor=1):
+        self.scale = scale # Масштаб уменьшенного снимка экрана
+        self.interval = interval # Минимальная пауза между проходами, секунды
+        self.cpu_budget = cpu_budget # Доля одного ядра, которую может занимать поиск
+        self.cell = cell # Размер ячейки тепловой карты в пикселях уменьшенного снимка
+        self.decay = decay # Затухание очков за проход
+        self.min_score = min_score # Сколько очков нужно ячейке, чтобы попасть в область
+        self.padding = padding # Отступ вокруг найденной области в пикселях экрана
+        self.monitor = monitor
+        self.localizer = TextLocalizer(
+            min_height=max(3, int(6 * scale)), max_height=int(80 * scale), padding=0
+        )
+        self.heat = None
+        self._previous = None
+        self.passes = 0
+        self.cpu_time = 0.0
+        self.suggestion = None
+
+    def _grab(self, sct):
+        monitor = sct.monitors[self.monitor]
+        sct_img = sct.grab(monitor)
+        bgra = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+        gray = cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY)
+        small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        # Коэффициент пересчета в логические координаты экрана (на HiDPI снимок больше монитора)
+        to_screen = monitor["width"] / small.shape[1]
+        return small, monitor, to_screen
+
+    def update(self, small):
+        """Добавляет уменьшенный Ч/Б снимок экрана в тепловую карту."""
+        rows, cols = small.shape[0] // self.cell, small.shape[1] // self.cell
+        if self.heat is None or self.heat.shape != (rows, cols):
+            self.heat = np.zeros((rows, cols), dtype=np.float32)
+            self._previous = None
+
+        text = np.zeros((rows, cols), dtype=bool)
+        for x, y, w, h in self.localizer.locate(small):
+            text[y // self.cell:(y + h - 1) // self.cell + 1, x // self.cell:(x + w - 1) // self.cell + 1] = True
+
+        cropped = small[:rows * self.cell, :cols * self.cell]
+        means = cropped.reshape(rows, self.cell, cols, self.cell).mean(axis=(1, 3))
+        if self._previous is not None:
+            changed = np.abs(means - self._previous) > 2.0
+            self.heat *= self.decay
+            self.heat[text & changed] += 1.0
+        self._previous = means
+        self.passes += 1
+
+    def best_box(self):
+        """Рамка (x, y, w, h) самого "горячего" участка в пикселях уменьшенного снимка или None."""
+        if self.heat is None:
+            return None
+        hot = (self.heat >= self.min_score).astype(np.uint8)
+        if not hot.any():
+            return None
+        # Соседние строки одного субтитра сливаются в один участок
+        hot = cv2.dilate(hot, np.ones((3, 3), np.uint8))
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(hot)
+        best, best_score = None, 0.0
+        for label in range(1, count):
+            score = float(self.heat[labels == label].sum())
+            if score > best_score:
+                best, best_score = label, score
+        x, y, w, h = stats[best, :4]
+        return x * self.cell, y * self.cell, w * self.cell, h * self.cell
+
+    def suggest(self, monitor, to_screen):
+        """Предлагаемая область в формате text_areas (координаты экрана) или None."""
+        box = self.best_box()
+        if box is None:
+            return None
+        x, y, w, h = (int(round(value * to_screen)) for value in box)
+        left = max(monitor["left"], monitor["left"] + x - self.padding)
+        top = max(monitor["top"], monitor["top"] + y - self.padding)
+        right = min(monitor["left"] + monitor["width"], monitor["left"] + x + w + self.padding)
+        bottom = min(monitor["top"] + monitor["height"], monitor["top"] + y + h + self.padding)
+        return {"top": top, "left": left, "width": right - left, "height": bottom - top}
+
+    def run(self, on_suggest, stop_event):
+        """Цикл поиска; выполняется в отдельном потоке до stop_event."""
+        with mss.mss() as sct:
+            while not stop_event.is_set():
+                started = time.thread_time()
+                small, monitor, to_screen = self._grab(sct)
+                self.update(small)
+                suggestion = self.suggest(monitor, to_screen)
+                cost = time.thread_time() - started
+                self.cpu_time += cost
+
+                if suggestion is not None and not same_area(suggestion, self.suggestion):
+                    self.suggestion = suggestion
+                    on_suggest(suggestion)
+
+                # Пауза такая, чтобы средняя загрузка не превышала бюджет
+                stop_event.wait(max(self.interval, cost / self.cpu_budget))
+
+    def start(self, on_suggest, stop_event):
+        thread = threading.Thread(target=self.run, args=(on_suggest, stop_event), daemon=True)
+        thread.start()
+        return thread
+
+
+def same_area(a, b, tolerance=0.8):
+    """Области совпадают, если отношение пересечения к объединению не меньше tolerance."""
+    if a is None or b is None:
+        return False
+    x0, y0 = max(a["left"], b["left"]), max(a["top"], b["top"])
+    x1 = min(a["left"] + a["width"], b["left"] + b["width"])
+    y1 = min(a["top"] + a["height"], b["top"] + b["height"])
+    intersection = max(0, x1 - x0) * max(0, y1 - y0)
+    union = a["width"] * a["height"] + b["width"] * b["height"] - intersection
+    return union > 0 and intersection / union >= tolerance
+
+
+def load_discovered_areas(path):
+    """Области, найденные в прошлых сеансах, или None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_discovered_areas(path, areas):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(areas, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Region:
+    """Прямоугольная область экрана для распознавания."""
+    name: str
+    top: int
+    left: int
+    width: int
+    height: int
+
+    @classmethod
+    def from_dict(cls, name, area):
+        return cls(name=name, top=area["top"], left=area["left"], width=area["width"], height=area["height"])
+
+    def as_monitor(self):
+        """Область в формате mss."""
+        return {"top": self.top, "left": self.left, "width": self.width, "height": self.height}
+
+    def box_in(self, union):
+        """Координаты (x0, y0, x1, y1) области внутри объединенного снимка."""
+        x0 = self.left - union["left"]
+        y0 = self.top - union["top"]
+        return (x0, y0, x0 + self.width, y0 + self.height)
+
+
+def union_area(regions):
+    """Наименьший прямоугольник в формате mss, покрывающий все области."""
+    top = min(r.top for r in regions)
+    left = min(r.left for r in regions)
+    bottom = max(r.top + r.height for r in regions)
+    right = max(r.left + r.width for r in regions)
+    return {"top": top, "left": left, "width": right - left, "height": bottom - top}
@@ -0,0 +1,240 @@
+"""
+Воспроизведение записанного корпуса кадров через конвейер без экрана, GUI и горячих клавиш.
+
+Примеры:
+    python replay.py corpus/session1
+    python replay.py corpus/session1 --no-translate --json report.json
+    python replay.py corpus/session1 --no-translate --preset raw --preset otsu
+    python replay.py corpus/session1 --no-translate --all-presets
+    python replay.py corpus/session1 --beam-size 2 --compute-type int8 --intra-threads 4
+    python replay.py corpus/session1 --backend libretranslate --url http://192.168.1.10:5000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from frame_corpus import FrameCorpus
+from fuzzy_index import bounded_levenshtein
+from metrics import Metrics
+from ocr_preprocess import PRESETS
+from pipeline import Pipeline, LatestQueue, Frame
+from regions import Region
+from translation_service import TranslationService, create_backend
+
+
+def summarize(summary):
+    """Сводка гистограммы в миллисекундах."""
+    result = {"count": summary["count"]}
+    if summary["count"]:
+        result["mean"] = round(summary["sum"] * 1000 / summary["count"], 3)
+    for key, value in summary.items():
+        if key not in ("count", "sum"):
+            result[key] = round(value * 1000, 3)
+    return result
+
+
+def char_errors(text, expected):
+    """Число правок между распознанным и правильным текстом (пробелы нормализуются)."""
+    text, expected = " ".join(text.split()), " ".join(expected.split())
+    return bounded_levenshtein(text, expected, max(len(text), len(expected)))
+
+
+def add_translation_arguments(parser):
+    """Параметры переводчика - те же, что TRANSLATION_* в start.py."""
+    group = parser.add_argument_group("переводчик")
+    group.add_argument("--backend", default="argos", choices=["argos", "libretranslate"])
+    group.add_argument("--beam-size", type=int, default=4, help="ширина луча CTranslate2")
+    group.add_argument("--max-batch", type=int, default=32, help="предложений в одном пакете")
+    group.add_argument("--batch-window", type=float, default=0.02, help="сколько ждать запросы в пакет, секунды")
+    group.add_argument("--inter-threads", type=int, default=1, help="пакетов CTranslate2 одновременно")
+    group.add_argument("--intra-threads", type=int, default=0, help="потоков на пакет (0 - по числу ядер)")
+    group.add_argument("--compute-type", default="int8", help="тип вычислений CTranslate2 (int8, float32, ...)")
+    group.add_argument("--url", default="http://127.0.0.1:5000", help="адрес сервера LibreTranslate")
+    group.add_argument("--api-key", help="ключ API LibreTranslate")
+    group.add_argument("--timeout", type=float, default=2.0, help="таймаут сетевого переводчика, секунды")
+
+
+def translation_options(args):
+    """Параметры create_backend() и TranslationService из разобранных аргументов."""
+    if args.backend == "libretranslate":
+        backend = {"backend": "libretranslate", "url": args.url, "api_key": args.api_key, "timeout": args.timeout}
+    else:
+        backend = {
+            "backend": "argos",
+            "beam_size": args.beam_size,
+            "max_batch_size": args.max_batch,
+            "inter_threads": args.inter_threads,
+            "intra_threads": args.intra_threads,
+            "compute_type": args.compute_type,
+        }
+    return {"backend_options": backend, "batch_window": args.batch_window, "max_batch": args.max_batch}
+
+
+class ReplayRunner:
+    """
+    Прогоняет кадры корпуса через те же стадии, что и translator_thread,
+    синхронно и по порядку, и собирает задержки и счетчики по стадиям.
+    Перевод идет так же, как в программе: переводчик из create_backend()
+    за TranslationService, который собирает предложения в пакеты.
+    """
+
+    def __init__(self, corpus, translate=True, metrics_window=None, backend_options=None, batch_window=0.02,
+                 max_batch=32, **pipeline_options):
+        self.corpus = corpus
+        # Собственный реестр; по умолчанию без ограничения окна: в отчет попадают все замеры
+        self.metrics = Metrics(window=metrics_window)
+        self.errors = 0 # Правок OCR на размеченных кадрах
+        self.expected_chars = 0
+
+        translate_fn = None
+        self.backend = self.translation_service = None
+        if not translate:
+            translate_fn = lambda text, from_code, to_code: text
+        else:
+            self.backend = create_backend(**(backend_options or {}))
+            self.translation_service = TranslationService(
+                self.backend.translate_batch, window=batch_window, max_batch=max_batch
+            )
+            pipeline_options["translate_batch_fn"] = self.translation_service.translate_many
+
+        regions = [Region.from_dict(name, area) for name, area in corpus.regions.items()]
+        pipeline_options.setdefault("translation_memory_path", ":memory:")
+        pipeline_options.setdefault("ocr_workers", 1)
+        self.pipeline = Pipeline(
+            frames=LatestQueue(),
+            regions=regions,
+            on_show=lambda region, text: None,
+            on_hide=lambda region: None,
+            translate_fn=translate_fn,
+            metrics=self.metrics,
+            **pipeline_options,
+        )
+
+    def feed(self, time_offset=0.0):
+        """Один проход по корпусу; время кадров сдвигается на time_offset секунд."""
+        pipeline = self.pipeline
+        for timestamp, frame_index, image in self.corpus.items():
+            timestamp += time_offset
+            # Отложенный стабилизатором текст оценивается по времени записи
+            pipeline.release_held(now=timestamp)
+            frame = Frame(image=np.asarray(image))
+            changed = pipeline.diff_stage(frame)
+            if not changed:
+                self.metrics.inc("frames_skipped")
+                continue
+
+            for region_frame in changed:
+                job = pipeline.ocr_stage(region_frame)
+                expected = self.corpus.expected_text(frame_index, region_frame.region)
+                if expected is not None:
+                    self.errors += char_errors(job.text if job is not None else "", expected)
+                    self.expected_chars += len(" ".join(expected.split()))
+                if job is None:
+                    continue
+                pipeline.translate_stage(job, now=timestamp)
+
+    def run(self):
+        pipeline = self.pipeline
+        started = time.perf_counter()
+        self.feed()
+        pipeline.release_held(now=float("inf"))
+        elapsed = time.perf_counter() - started
+
+        snapshot = self.metrics.snapshot()
+        report = {
+            "corpus": self.corpus.path,
+            "elapsed_s": round(elapsed, 3),
+            "counters": snapshot["counters"],
+            "stages": {stage: summarize(summary) for stage, summary in snapshot["timings"].items()},
+            "translation_memory": pipeline.translation_memory.stats(),
+        }
+        if self.expected_chars:
+            # Доля правильно распознанных символов на размеченных кадрах
+            report["char_accuracy"] = round(max(0.0, 1 - self.errors / self.expected_chars), 4)
+        if self.translation_service is not None:
+            report["translation_batches"] = self.translation_service.batches
+            report["translation_batched_texts"] = self.translation_service.batched_texts
+        self.close()
+        return report
+
+    def close(self):
+        self.pipeline.stop()
+        if self.translation_service is not None:
+            self.translation_service.close()
+            self.backend.close()
+
+
+def print_report(report):
+    print(f"Корпус: {report['corpus']}, время прогона {report['elapsed_s']} с")
+    if "char_accuracy" in report:
+        print(f"  Точность OCR по символам: {report['char_accuracy']}")
+    for name, value in report["counters"].items():
+        print(f"  {name}: {value}")
+    if "translation_batches" in report:
+        print(f"  Пакетный перевод: {report['translation_batches']} пакетов, "
+              f"{report['translation_batched_texts']} предложений")
+    print("Задержки по стадиям, мс:")
+    for stage, stats in report["stages"].items():
+        print(f"  {stage:<10} " + " ".join(f"{k}={v}" for k, v in stats.items()))
+
+
+def print_comparison(reports):
+    """Сравнение предустановок OCR: задержка против точности."""
+    print(f"{'предустановка':<14} {'прогон, с':>10} {'ocr p50':>9} {'ocr p90':>9} {'предобр.':>9} {'точность':>9}")
+    for name, report in reports.items():
+        ocr = report["stages"].get("ocr", {})
+        preprocess = report["stages"].get("preprocess", {})
+        accuracy = report.get("char_accuracy", "-")
+        print(f"{name:<14} {report['elapsed_s']:>10} {ocr.get('p50', '-'):>9} {ocr.get('p90', '-'):>9} "
+              f"{preprocess.get('p50', '-'):>9} {accuracy:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение корпуса кадров через конвейер OCR и перевода.")
+    parser.add_argument("corpus", help="каталог корпуса, записанного FrameRecorder")
+    parser.add_argument("--no-translate", action="store_true", help="не вызывать argostranslate")
+    parser.add_argument("--no-mser", action="store_true", help="распознавать всю область без поиска строк")
+    parser.add_argument("--preset", action="append", choices=sorted(PRESETS),
+                        help="предобработка кадра перед OCR; можно указать несколько для сравнения")
+    parser.add_argument("--min-confidence", type=float, default=0,
+                        help="минимальная уверенность OCR для строки и кадра (0-100)")
+    parser.add_argument("--glossary", help="словарь терминов с фиксированным переводом")
+    parser.add_argument("--all-presets", action="store_true", help="сравнить все предустановки OCR")
+    parser.add_argument("--json", help="записать отчет в JSON-файл")
+    add_translation_arguments(parser)
+    args = parser.parse_args()
+
+    presets = list(PRESETS) if args.all_presets else args.preset or ["raw"]
+    reports = {}
+    for preset in presets:
+        runner = ReplayRunner(
+            FrameCorpus(args.corpus),
+            translate=not args.no_translate,
+            use_text_localizer=not args.no_mser,
+            ocr_preset=preset,
+            min_line_confidence=args.min_confidence,
+            min_frame_confidence=args.min_confidence,
+            glossary_path=args.glossary,
+            **translation_options(args),
+        )
+        reports[preset] = runner.run()
+
+    if len(reports) == 1:
+        report = reports[presets[0]]
+        print_report(report)
+    else:
+        report = {"presets": reports}
+        for name, preset_report in reports.items():
+            print(f"--- {name} ---")
+            print_report(preset_report)
+        print_comparison(reports)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
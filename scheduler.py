@@ -0,0 +1,46 @@
+import threading
+
+
+class CaptureScheduler:
+    """
+    Адаптивный планировщик запросов захвата экрана.
+
+    Пока текст меняется, снимки делаются с минимальным интервалом; пока
+    область неподвижна, интервал растет экспоненциально до максимального.
+    Если захват выключен, планировщик спит до вызова wake().
+    """
+
+    def __init__(self, min_interval=0.25, max_interval=1.0, backoff=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def report(self, changed):
+        """Изменился ли текст на экране (сдвиг одного фона под неподвижным текстом - нет)."""
+        with self._lock:
+            if changed:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def wake(self):
+        """Немедленно сделать снимок (или перепроверить, включен ли захват)."""
+        with self._lock:
+            self.interval = self.min_interval
+        self._wake.set()
+
+    def run(self, request_capture, is_enabled, stop_event):
+        """Цикл планировщика; выполняется в отдельном потоке до stop_event."""
+        while not stop_event.is_set():
+            if not is_enabled():
+                # Захват выключен - спим без таймаута, разбудит wake()
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            request_capture()
+            self._wake.wait(self.interval)
+            self._wake.clear()
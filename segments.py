@@ -0,0 +1,31 @@
+import re
+
+# Граница предложения: завершающая пунктуация (с возможной кавычкой или скобкой) и пробел
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])["\')\]]*\s+(?=\S)')
+
+# Сокращения, после которых точка не завершает предложение
+_ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "vs.", "etc.", "e.g.", "i.e.", "no."}
+
+
+def split_segments(text):
+    """Разбивает очищенный текст на предложения для независимого перевода."""
+    segments = []
+    start = 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        segment = text[start:match.end()].strip()
+        if segment.rsplit(" ", 1)[-1].lower() in _ABBREVIATIONS:
+            continue
+        segments.append(segment)
+        start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        segments.append(tail)
+    return segments
+
+
+_SENTENCE_END = re.compile(r'[.!?…]["\')\]]*$')
+
+
+def is_complete_sentence(text):
+    """Текст заканчивается завершающей пунктуацией."""
+    return bool(_SENTENCE_END.search(text.strip()))
@@ -0,0 +1,116 @@
+"""
+Проверка памяти в долгом сеансе: записанный корпус кадров прогоняется
+через конвейер по кругу, пока не наберется заданное время сеанса, и
+проверяется, что RSS процесса после прогрева не растет больше порога.
+
+Код возврата 1, если рост памяти превысил порог.
+
+Примеры:
+    python soak.py corpus/session1 --hours 8 --no-translate
+    python soak.py corpus/session1 --hours 8 --max-growth-mb 32 --recycle-every 2000 --tracemalloc 5
+"""
+import argparse
+import gc
+import sys
+import time
+
+from frame_corpus import FrameCorpus
+from memory_monitor import MemoryMonitor, current_rss
+from ocr_preprocess import PRESETS
+from replay import ReplayRunner, add_translation_arguments, translation_options
+
+MB = 1024 * 1024
+
+
+def corpus_duration(corpus):
+    """Длительность записи корпуса с учетом интервала после последнего кадра."""
+    if not corpus.entries:
+        return 0.0
+    first, last = corpus.entries[0][0], corpus.entries[-1][0]
+    if len(corpus.entries) < 2:
+        return 1.0
+    step = (last - first) / (len(corpus.entries) - 1)
+    return last - first + max(step, 0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка роста памяти конвейера в долгом сеансе.")
+    parser.add_argument("corpus", help="каталог корпуса, записанного FrameRecorder")
+    parser.add_argument("--hours", type=float, default=8.0, help="моделируемая длительность сеанса, часы")
+    parser.add_argument("--max-growth-mb", type=float, default=64.0, help="допустимый рост RSS после прогрева, МБ")
+    parser.add_argument("--warmup-passes", type=int, default=2, help="проходов по корпусу до замера базового RSS")
+    parser.add_argument("--no-translate", action="store_true", help="не вызывать argostranslate")
+    parser.add_argument("--preset", default="otsu", choices=sorted(PRESETS), help="предобработка кадра перед OCR")
+    parser.add_argument("--clear-every", type=int, default=200,
+                        help="сбрасывать адаптивный классификатор Tesseract каждые N распознаваний")
+    parser.add_argument("--recycle-every", type=int, default=5000,
+                        help="пересоздавать экземпляр Tesseract каждые N распознаваний")
+    parser.add_argument("--tracemalloc", type=int, default=0, metavar="FRAMES",
+                        help="включить tracemalloc с заданной глубиной стека и вывести места роста")
+    add_translation_arguments(parser)
+    args = parser.parse_args()
+
+    corpus = FrameCorpus(args.corpus)
+    duration = corpus_duration(corpus)
+    if duration <= 0:
+        print("Корпус пуст.")
+        return 1
+
+    runner = ReplayRunner(
+        corpus,
+        translate=not args.no_translate,
+        metrics_window=2048, # В долгом прогоне окно замеров тоже ограничено
+        ocr_preset=args.preset,
+        ocr_clear_every=args.clear_every,
+        ocr_recycle_every=args.recycle_every,
+        **translation_options(args),
+    )
+    monitor = MemoryMonitor(runner.metrics)
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start(args.tracemalloc)
+
+    warmup = max(1, args.warmup_passes)
+    target = args.hours * 3600
+    passes = max(warmup + 1, int(target // duration) + 1)
+    print(f"Корпус {duration:.1f} с, проходов: {passes} ({passes * duration / 3600:.1f} ч моделируемого времени)")
+
+    started = time.perf_counter()
+    baseline = peak = None
+    report_every = max(1, passes // 10)
+    for number in range(passes):
+        runner.feed(time_offset=number * duration)
+        if number + 1 < warmup:
+            continue
+
+        gc.collect()
+        rss = current_rss()
+        if number + 1 == warmup:
+            baseline = peak = rss
+            monitor.report_allocations() # Первый снимок tracemalloc - база для сравнения
+            print(f"RSS после прогрева: {rss / MB:.1f} МБ")
+            continue
+        peak = max(peak, rss)
+        if (number + 1) % report_every == 0:
+            print(f"  {(number + 1) * duration / 3600:.2f} ч: RSS {rss / MB:.1f} МБ "
+                  f"(+{(rss - baseline) / MB:.1f} МБ), прошло {time.perf_counter() - started:.0f} с")
+
+    runner.pipeline.release_held(now=float("inf"))
+    gc.collect()
+    final = current_rss()
+    growth = (final - baseline) / MB
+    print(f"RSS: база {baseline / MB:.1f} МБ, пик {peak / MB:.1f} МБ, в конце {final / MB:.1f} МБ, рост {growth:+.1f} МБ")
+    monitor.report_allocations()
+    counters = runner.metrics.snapshot()["counters"]
+    print(f"Распознаваний: {counters.get('ocr_calls', 0)}, переводов: {counters.get('translations', 0)}")
+    runner.close()
+
+    if growth > args.max_growth_mb:
+        print(f"ОШИБКА: рост памяти {growth:.1f} МБ больше допустимых {args.max_growth_mb} МБ")
+        return 1
+    print("Рост памяти в пределах нормы.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+from segments import is_complete_sentence
+
+
+def is_growing(previous, text):
+    """
+    Текст дописывается: новый длиннее и начинается с предыдущего.
+    Последнее слово предыдущего текста может быть недописанным, поэтому
+    оно при сравнении не учитывается.
+    """
+    if not previous or len(text) <= len(previous):
+        return False
+    if text.startswith(previous):
+        return True
+    head = previous.rsplit(" ", 1)[0]
+    return head != previous and text.startswith(head)
+
+
+class TextStabilizer:
+    """
+    Детектор посимвольного появления текста для одной области.
+
+    Незаконченный текст переводится, только когда простоит без изменений
+    stable_window секунд: первый фрагмент "печатающейся" реплики ("Hel")
+    выглядит как новый текст, и переводить его сразу - лишний перевод.
+    Законченное предложение переводится сразу. Пока текст дописывается,
+    перевод откладывается не дольше max_hold секунд.
+    """
+
+    def __init__(self, stable_window=0.6, max_hold=3.0):
+        self.stable_window = stable_window
+        self.max_hold = max_hold
+        self.reset()
+
+    def reset(self):
+        self._text = None
+        self._since = None # Когда текст принял текущее значение
+        self._hold_started = None # Когда началось откладывание перевода
+        self.typing = False
+
+    def update(self, text, now):
+        """Возвращает 0, если текст можно переводить, иначе сколько еще секунд ждать."""
+        if text != self._text:
+            self.typing = is_growing(self._text, text)
+            self._text = text
+            self._since = now
+            if not self.typing:
+                self._hold_started = None
+
+        if is_complete_sentence(text):
+            self._hold_started = None
+            return 0.0
+
+        if self._hold_started is None:
+            self._hold_started = now
+        wait = min(
+            self.stable_window - (now - self._since),
+            self.max_hold - (now - self._hold_started),
+        )
+        if wait <= 0:
+            self._hold_started = None
+            return 0.0
+        return wait
@@ -1,3 +1,8 @@
+import time
+# Момент запуска, от него считается время до первого перевода
+STARTED_AT = time.perf_counter()
+
+import os
 import sys
 import threading
 import queue
@@ -7,12 +12,20 @@ import wx
 import ctypes
 import re
 from dataclasses import dataclass
-import mss
-import numpy as np
-import tesserocr
-from PIL import Image
-from argostranslate import translate
-from skimage.metrics import structural_similarity as ssim
+# Тяжелые модули (tesserocr, argostranslate, ctranslate2, skimage) импортируются
+# лениво в потоке-обработчике, поэтому окно OSD появляется сразу
+from pipeline import Pipeline, LatestQueue
+from capture import ScreenCapture
+from scheduler import CaptureScheduler
+from frame_corpus import FrameRecorder
+from metrics import metrics
+from translation_service import TranslationService, create_backend
+from regions import Region, union_area
+from process_pipeline import OcrProcessPool, SharedFrameRing
+from text_fit import FontFitter
+from region_discovery import RegionDiscovery, same_area, load_discovered_areas, save_discovered_areas
+from memory_monitor import MemoryMonitor
+from overlay_mask import OverlayMask, render_glyph_mask, unblend
 
 # Определяем возможные команды для GUI
 class Command(Enum):
@@ -25,119 +38,359 @@ class Command(Enum):
 class Message:
     command: Command
     payload: str = ""
+    region: str = "" # Имя области; пустая строка - все области
+
+class GuiChannel:
+    """
+    Доставка сообщений в GUI-поток без опроса по таймеру.
+
+    put() можно вызывать из любого потока: сообщение объединяется с еще
+    не доставленными, и если доставка еще не запланирована, она ставится
+    в очередь событий wx через wx.CallAfter. Из пачки сообщений до GUI
+    доходит только последнее состояние SHOW/HIDE каждой области и один
+    запрос захвата. Сообщения, пришедшие до запуска GUI, доставляются
+    после attach().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {} # Область ("" - все области) -> (сообщение, время отправки); порядок - порядок прихода
+        self._capture_requested = False
+        self._stop_requested = False
+        self._scheduled = False
+        self._handler = None
+
+    def attach(self, handler):
+        """Назначает обработчик сообщений в GUI-потоке (None - отключить)."""
+        with self._lock:
+            self._handler = handler
+        self._schedule()
+
+    def put(self, message):
+        with self._lock:
+            match message.command:
+                case Command.REQUEST_CAPTURE:
+                    self._capture_requested = True
+                case Command.STOP:
+                    self._stop_requested = True
+                case _:
+                    previous = self._pending.pop(message.region, None)
+                    if (previous is not None and previous[0].command == Command.SHOW
+                            and message.command == Command.SHOW and message.payload is None):
+                        # "Показать снова" не должно терять еще не показанный текст
+                        message = previous[0]
+                    self._pending[message.region] = (message, time.perf_counter())
+        self._schedule()
+
+    def qsize(self):
+        with self._lock:
+            return len(self._pending) + self._capture_requested + self._stop_requested
+
+    def _schedule(self):
+        with self._lock:
+            if self._scheduled or self._handler is None:
+                return
+            if not (self._pending or self._capture_requested or self._stop_requested):
+                return
+            self._scheduled = True
+        wx.CallAfter(self._deliver)
+
+    def _deliver(self):
+        with self._lock:
+            self._scheduled = False
+            handler = self._handler
+            pending = list(self._pending.values())
+            self._pending.clear()
+            capture_requested, self._capture_requested = self._capture_requested, False
+            stop_requested, self._stop_requested = self._stop_requested, False
+        if handler is None:
+            return
+
+        if stop_requested:
+            handler(Message(command=Command.STOP))
+            return
+        # Снимок раньше SHOW/HIDE той же пачки: на экране еще прежний текст окон,
+        # и вычитается именно его изображение
+        if capture_requested:
+            handler(Message(command=Command.REQUEST_CAPTURE))
+        now = time.perf_counter()
+        for message, posted_at in pending:
+            metrics.observe("gui_delivery", now - posted_at)
+            handler(message)
 
 # --- Глобальные объекты для межпоточного взаимодействия ---
 
-# Очередь для передачи данных от потока-обработчика в GUI
-gui_queue = queue.Queue()
+# Канал для передачи сообщений от потоков в GUI
+gui_queue = GuiChannel()
 
-# Очередь для передачи захваченного изображения от GUI к worker'у
-capture_queue = queue.Queue(maxsize=1)
+# Очередь для передачи захваченного изображения от GUI к worker'у.
+# Новый снимок вытесняет необработанный старый.
+capture_queue = LatestQueue()
 
 # Событие для сигнала о завершении работы всем потокам
 shutdown_event = threading.Event()
 
+# Планировщик захвата: чаще, пока текст меняется, реже - пока экран неподвижен.
+# Реже раза в секунду не снимаем: субтитр бывает на экране всего 2-4 с
+capture_scheduler = CaptureScheduler(min_interval=0.25, max_interval=1.0)
+
 osd_enabled_by_user = True
 osd_window_is_visible = True # Отвечает за видимость окна OSD
 
-# Область для распознавания
-text_area = {"top": 865, "left": 535, "width": 840, "height": 130}
-
-def calculate_image_print(img):
-    """Конвертирует изображение в Ч/Б для сравнения."""
-    return np.array(img.convert('L'))
-
-def calculate_diff(img_print_1, img_print_2):
-    """Сравнивает два изображения и возвращает процент различия."""
-    if img_print_1.shape != img_print_2.shape:
-        return 100.0 # Если размеры не совпадают, считаем их полностью разными
-    (score, diff) = ssim(img_print_1, img_print_2, full=True)
-    # SSIM показывает схожесть, мы возвращаем разницу
-    return (1 - score) * 100
+# Области для распознавания. Для каждой создается свое окно OSD.
+text_areas = {
+    "subtitles": {"top": 865, "left": 535, "width": 840, "height": 130},
+    # "dialogue": {"top": 700, "left": 400, "width": 1100, "height": 150},
+    # "quest_log": {"top": 120, "left": 1500, "width": 380, "height": 300},
+}
+
+# Фоновый поиск области субтитров по всему экрану:
+# None - выключен; "suggest" - только выводить найденную область;
+# "auto" - сохранять ее в DISCOVERED_REGIONS_PATH и использовать при следующем запуске
+REGION_DISCOVERY = None
+DISCOVERED_REGIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "discovered_regions.json")
+# Доля одного ядра, которую может занимать поиск
+REGION_DISCOVERY_CPU_BUDGET = 0.02
+
+if REGION_DISCOVERY == "auto":
+    text_areas = load_discovered_areas(DISCOVERED_REGIONS_PATH) or text_areas
+
+regions = [Region.from_dict(name, area) for name, area in text_areas.items()]
+
+# Число потоков OCR (у каждого свой экземпляр Tesseract)
+OCR_WORKERS = min(2, len(regions))
+
+# Искать строки текста с помощью MSER и распознавать только их
+USE_TEXT_LOCALIZER = True
+
+# Предобработка кадра перед OCR и режим Tesseract (см. ocr_preprocess.PRESETS;
+# сравнить предустановки на записанном корпусе: python replay.py corpus/... --all-presets)
+OCR_PRESET = "otsu"
+
+# Отсев мусора по уверенности Tesseract (0-100): слова и строки ниже порога
+# отбрасываются, кадр со средней уверенностью ниже порога считается пустым
+OCR_MIN_WORD_CONFIDENCE = 30
+OCR_MIN_LINE_CONFIDENCE = 50
+OCR_MIN_FRAME_CONFIDENCE = 55
+
+# Незаконченный текст переводится, когда простоит без изменений STABLE_WINDOW секунд;
+# пока он появляется посимвольно, перевод откладывается не дольше MAX_HOLD секунд
+STABLE_WINDOW = 0.6
+MAX_HOLD = 3.0
+# Пока текст печатается, показывать перевод уже законченных предложений из кэша
+SHOW_PROVISIONAL = True
+
+# Каталог для записи снимков в корпус для replay.py (None - не записывать)
+RECORD_CORPUS_DIR = None
+
+# Порт локального HTTP-сервера метрик в формате Prometheus (None - не запускать)
+METRICS_PORT = None
+
+# Файл, в который по горячей клавише сохраняется снимок метрик
+METRICS_DUMP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics.json")
+
+# Файл памяти переводов
+TRANSLATION_MEMORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translation_memory.sqlite3")
+
+# Словарь терминов с фиксированным переводом (формат - см. glossary.example.txt);
+# если файла нет, словарь не используется
+GLOSSARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "glossary.txt")
+
+# Максимальное число правок, при котором распознанный текст считается
+# дрожанием OCR уже переведенной строки
+FUZZY_MAX_DISTANCE = 2
+
+# Пакетный перевод через CTranslate2: запросы всех областей, пришедшие в
+# течение окна (секунды), отправляются одним пакетом
+TRANSLATION_BATCH_WINDOW = 0.02
+TRANSLATION_MAX_BATCH = 32
+TRANSLATION_BEAM_SIZE = 4
+TRANSLATION_INTER_THREADS = 1
+TRANSLATION_INTRA_THREADS = 0 # 0 - по числу ядер
+TRANSLATION_COMPUTE_TYPE = "int8"
+
+# Переводчик: "argos" - модель в этом процессе; "libretranslate" - сервер с API
+# LibreTranslate в локальной сети (для проверки: python libretranslate_stub.py)
+TRANSLATION_BACKEND = "argos"
+LIBRETRANSLATE_URL = "http://127.0.0.1:5000"
+LIBRETRANSLATE_API_KEY = None
+# Сколько ждать ответа сервера; после таймаута на экране остается прежний
+# перевод, а попытка повторяется через TRANSLATION_RETRY_DELAY секунд
+TRANSLATION_TIMEOUT = 2.0
+TRANSLATION_RETRY_DELAY = 1.0
+
+# Непрозрачность окон OSD
+OSD_OPACITY = 0.7
+
+# Как не допустить окно OSD в снимок там, где нельзя исключить его из захвата (не Windows):
+# "unblend" - окно не скрывается, его известное изображение вычитается из снимка;
+# "hide" - окно становится прозрачным на 50 мс на время снимка (мерцает)
+CAPTURE_OVERLAY_MODE = "unblend"
+# Сколько ждать после смены текста окна, прежде чем вычитать его изображение из
+# снимка: композитор должен успеть вывести новую надпись
+OVERLAY_REPAINT_DELAY = 0.05
+
+# Долгие сеансы: сбрасывать адаптивный классификатор Tesseract каждые N распознаваний
+# и пересоздавать экземпляр Tesseract каждые M распознаваний (0 - не делать)
+OCR_CLEAR_EVERY = 200
+OCR_RECYCLE_EVERY = 5000
+# Размер кэша переводов в памяти и число строк для нечеткого поиска
+TRANSLATION_MEMORY_BYTES = 4 * 1024 * 1024
+FUZZY_MAX_ENTRIES = 256
+# Как часто снимать RSS процесса (датчики rss_bytes и rss_growth_bytes), секунды
+MEMORY_MONITOR_INTERVAL = 60
+# Глубина стека tracemalloc; больше нуля - раз в MEMORY_MONITOR_INTERVAL печатать места роста памяти
+TRACEMALLOC_FRAMES = 0
+
+# Распознавать в пуле из OCR_WORKERS процессов: снимки передаются через общую
+# память, и Tesseract не делит GIL с GUI, горячими клавишами и переводом.
+# Метрики стадий OCR в этом режиме остаются в процессах пула.
+USE_WORKER_PROCESS = False
+
+# Кольцо снимков в общей памяти (создается при запуске в режиме USE_WORKER_PROCESS)
+shared_ring = None
 
 # --- Функции потоков ---
+def translation_backend_options():
+    """Параметры create_backend() для выбранного переводчика."""
+    if TRANSLATION_BACKEND == "libretranslate":
+        return {
+            "backend": "libretranslate",
+            "from_code": "en",
+            "to_code": "ru",
+            "url": LIBRETRANSLATE_URL,
+            "api_key": LIBRETRANSLATE_API_KEY,
+            "timeout": TRANSLATION_TIMEOUT,
+        }
+    return {
+        "backend": "argos",
+        "from_code": "en",
+        "to_code": "ru",
+        "beam_size": TRANSLATION_BEAM_SIZE,
+        "max_batch_size": TRANSLATION_MAX_BATCH,
+        "inter_threads": TRANSLATION_INTER_THREADS,
+        "intra_threads": TRANSLATION_INTRA_THREADS,
+        "compute_type": TRANSLATION_COMPUTE_TYPE,
+    }
+
 def translator_thread():
     """
-    Поток, который выполняет основную работу по распознаванию и переводу.
+    Поток, который запускает конвейер распознавания и перевода и ждет его завершения.
     """
     print("Поток-обработчик запущен.")
-    try:
-        ocr = tesserocr.PyTessBaseAPI(lang='eng')
-        last_image_print = None
-        last_text = None
-
-        while not shutdown_event.is_set():
-            if not osd_window_is_visible:
-                continue
-
-            try:
-                # Ждать, пока GUI-поток сделает снимок и положит его в очередь
-                img = capture_queue.get(block=True, timeout=0.5)
-                # При закрытии GUI отправляет None в очередь, чтобы "разбудить" этот поток.
-                # Получив None, мы должны корректно завершить цикл.
-                if img is None:
-                    break
-            except queue.Empty:
-                continue
-
-            # рабираем всю очередь если есть и обрабатываем только последнее изображение
-            while True:
-                try:
-                    img = capture_queue.get_nowait()
-                except queue.Empty:
-                    break
-            
-            # Сравнение с предыдущим снимком
-            current_image_print = calculate_image_print(img)
-            if last_image_print is not None:
-                diff = calculate_diff(current_image_print, last_image_print)
-                if diff < 1:  # Порог изменения 1%
-                    continue
-            last_image_print = current_image_print
-
-            # Распознавание текста
-            ocr.SetImage(img)
-            text = ocr.GetUTF8Text()
-
-            # Проверка и обработка текста
-            if not text.strip() or len(text.strip()) < 3:
-                last_text = None
-                gui_queue.put(Message(command=Command.HIDE))
-                continue
-
-            if text == last_text:
-                continue
-            last_text = text
+    def on_error(e):
+        shutdown_event.set()
+        gui_queue.put(Message(command=Command.STOP))
 
-            # Исправление и подготовка текста
-            processed_text = text.replace("\n", " ").strip()
-            # Заменяем '1' на 'I', если перед ним не цифра, а после - не цифра и не точка.
-            processed_text = re.sub(r'(?<!\d)1(?![.\d])', 'I', processed_text)
-            processed_text = re.sub(r'(^|\s|[.,!?;()-])([/|])', r'\1I', processed_text)
-            processed_text = re.sub(r'([/|])', 'l', processed_text)
+    first_translation_shown = False
 
-            try:
-                # Перевод
-                translated_text = translate.translate(processed_text, "en", "ru")
-            except Exception as e:
-                translated_text = processed_text
-                continue
+    def on_show(region, text):
+        nonlocal first_translation_shown
+        if not first_translation_shown:
+            first_translation_shown = True
+            elapsed = time.perf_counter() - STARTED_AT
+            metrics.observe("time_to_first_translation", elapsed)
+            print(f"Первый перевод через {elapsed:.2f} с после запуска.")
+        gui_queue.put(Message(command=Command.SHOW, payload=text, region=region))
 
-            # Отправка результата в GUI
-            gui_queue.put(Message(command=Command.SHOW, payload=translated_text))
+    translation_backend = translation_service = ocr_process_pool = None
+    try:
+        if USE_WORKER_PROCESS:
+            ocr_process_pool = OcrProcessPool(shared_ring, regions, workers=OCR_WORKERS, ocr_options={
+                "use_text_localizer": USE_TEXT_LOCALIZER,
+                "ocr_preset": OCR_PRESET,
+                "min_word_confidence": OCR_MIN_WORD_CONFIDENCE,
+                "min_line_confidence": OCR_MIN_LINE_CONFIDENCE,
+                "min_frame_confidence": OCR_MIN_FRAME_CONFIDENCE,
+                "ocr_clear_every": OCR_CLEAR_EVERY,
+                "ocr_recycle_every": OCR_RECYCLE_EVERY,
+            })
+            ocr_process_pool.start()
+        translation_backend = create_backend(**translation_backend_options())
+        translation_service = TranslationService(
+            translation_backend.translate_batch,
+            window=TRANSLATION_BATCH_WINDOW,
+            max_batch=TRANSLATION_MAX_BATCH,
+        )
+        pipeline = Pipeline(
+            frames=capture_queue,
+            regions=regions,
+            on_show=on_show,
+            on_hide=lambda region: gui_queue.put(Message(command=Command.HIDE, region=region)),
+            on_error=on_error,
+            is_active=lambda: osd_window_is_visible,
+            on_diff=capture_scheduler.report,
+            translation_memory_path=TRANSLATION_MEMORY_PATH,
+            glossary_path=GLOSSARY_PATH,
+            fuzzy_max_distance=FUZZY_MAX_DISTANCE,
+            ocr_workers=OCR_WORKERS,
+            use_text_localizer=USE_TEXT_LOCALIZER,
+            ocr_preset=OCR_PRESET,
+            min_word_confidence=OCR_MIN_WORD_CONFIDENCE,
+            min_line_confidence=OCR_MIN_LINE_CONFIDENCE,
+            min_frame_confidence=OCR_MIN_FRAME_CONFIDENCE,
+            ocr_clear_every=OCR_CLEAR_EVERY,
+            ocr_recycle_every=OCR_RECYCLE_EVERY,
+            translation_memory_bytes=TRANSLATION_MEMORY_BYTES,
+            fuzzy_max_entries=FUZZY_MAX_ENTRIES,
+            translation_retry_delay=TRANSLATION_RETRY_DELAY,
+            stable_window=STABLE_WINDOW,
+            max_hold=MAX_HOLD,
+            show_provisional=SHOW_PROVISIONAL,
+            translate_workers=len(regions),
+            translate_batch_fn=translation_service.translate_many,
+            recognize_fn=ocr_process_pool.recognize if ocr_process_pool is not None else None,
+        )
+        # Загрузка моделей и первый вызов Tesseract и переводчика - до начала работы
+        pipeline.warm_up()
     except Exception as e:
         print(f"Критическая ошибка в рабочем потоке: {e}")
-        shutdown_event.set()
-        gui_queue.put(Message(command=Command.STOP))
+        if translation_service is not None:
+            translation_service.close()
+        if translation_backend is not None:
+            translation_backend.close()
+        if ocr_process_pool is not None:
+            ocr_process_pool.stop()
+        on_error(e)
+        return
+
+    elapsed = time.perf_counter() - STARTED_AT
+    metrics.observe("startup_ready", elapsed)
+    print(f"Модели загружены за {elapsed:.2f} с.")
+    # Убираем надпись о запуске; окна появятся с первым переводом
+    gui_queue.put(Message(command=Command.HIDE))
+
+    pipeline.start()
+    shutdown_event.wait()
+    pipeline.stop()
+    translation_service.close()
+    # Пул соединений и потоки сетевого переводчика не должны пережить программу
+    translation_backend.close()
+    if ocr_process_pool is not None:
+        ocr_process_pool.stop()
+    print(f"Пакетный перевод: {translation_service.batches} пакетов, {translation_service.batched_texts} предложений")
 
     print("Поток-обработчик завершен.")
-    
+
 def refresher_thread():
-    while not shutdown_event.is_set():
-        if osd_enabled_by_user:
-            gui_queue.put(Message(command=Command.REQUEST_CAPTURE))
-        
-        shutdown_event.wait(1)
+    """
+    Поток, который запрашивает у GUI снимки экрана по адаптивному расписанию.
+    Когда авто-обновление выключено или OSD скрыто, поток спит до нажатия горячей клавиши.
+    """
+    capture_scheduler.run(
+        request_capture=lambda: gui_queue.put(Message(command=Command.REQUEST_CAPTURE)),
+        is_enabled=lambda: osd_enabled_by_user and osd_window_is_visible,
+        stop_event=shutdown_event,
+    )
+
+def on_region_suggested(area):
+    """Поиск областей нашел место, где стабильно появляется меняющийся текст."""
+    if any(same_area(area, current) for current in text_areas.values()):
+        return
+    print(f"Найдена область субтитров: {area}")
+    if REGION_DISCOVERY == "auto":
+        save_discovered_areas(DISCOVERED_REGIONS_PATH, {"subtitles": area})
+        print(f"Область сохранена в {DISCOVERED_REGIONS_PATH} и будет использована при следующем запуске.")
 
 def setup_hotkey_listener():
     """
@@ -152,6 +405,7 @@ def setup_hotkey_listener():
         global osd_enabled_by_user
         osd_enabled_by_user = not osd_enabled_by_user
         print(f"Одиночное нажатие: авто-обновление {'ВКЛЮЧЕНО' if osd_enabled_by_user else 'ВЫКЛЮЧЕНО'}.")
+        capture_scheduler.wake()
 
     def on_toggle_osd():
         nonlocal single_press_timer
@@ -169,11 +423,16 @@ def setup_hotkey_listener():
                 gui_queue.put(Message(command=Command.SHOW, payload=None))
             else:
                 gui_queue.put(Message(command=Command.HIDE))
+            capture_scheduler.wake()
         else:
             # Первое нажатие: запускаем таймер, который выполнит действие для одиночного нажатия
             single_press_timer = threading.Timer(0.5, perform_single_press_action) # 500ms
             single_press_timer.start()
 
+    def on_dump_metrics():
+        metrics.dump_json(METRICS_DUMP_PATH)
+        print(f"Метрики сохранены в {METRICS_DUMP_PATH}.")
+
     def on_shutdown():
         print("Нажата комбинация для завершения работы. Завершение работы...")
         # Устанавливаем событие, только если оно еще не установлено,
@@ -182,10 +441,12 @@ def setup_hotkey_listener():
             shutdown_event.set()
             # Отправляем команду STOP, чтобы GUI-поток тоже корректно завершился
             gui_queue.put(Message(command=Command.STOP))
+            capture_scheduler.wake()
     
     with keyboard.GlobalHotKeys({
         '<ctrl>+<shift>+<f10>': on_shutdown,
         '<ctrl>+`': on_toggle_osd,
+        '<ctrl>+<shift>+<f9>': on_dump_metrics,
     }) as hotkey_listener:
         shutdown_event.wait()
     
@@ -194,14 +455,8 @@ def setup_hotkey_listener():
 # --- GUI on wxPython ---
 
 class WxFrame(wx.Frame):
-    def __init__(self):
-        # DPI awareness
-        if sys.platform == "win32":
-            try:
-                ctypes.windll.user32.SetProcessDPIAware()
-            except Exception as e:
-                print(f"Could not set DPI awareness: {e}")
-
+    """Окно OSD для одной области."""
+    def __init__(self, region, on_close):
         # Frame style for an OSD window
         style = (
             wx.CLIP_CHILDREN |
@@ -212,7 +467,8 @@ class WxFrame(wx.Frame):
             wx.TRANSPARENT_WINDOW
         )
 
-        super().__init__(None, title="OSD", style=style)
+        super().__init__(None, title=f"OSD {region.name}", style=style)
+        self.region = region
 
         # Make window click-through on Windows, similar to tkinter's `-disabled` attribute.
         # This allows mouse events to "fall through" the window.
@@ -221,11 +477,11 @@ class WxFrame(wx.Frame):
             extended_style = ctypes.windll.user32.GetWindowLongW(hwnd, -20) # GWL_EXSTYLE
             ctypes.windll.user32.SetWindowLongW(hwnd, -20, extended_style | 0x00000020) # WS_EX_TRANSPARENT
 
-        self.SetSize(text_area['width'], text_area['height'])
-        self.SetPosition((text_area['left'], text_area['top']))
+        self.SetSize(region.width, region.height)
+        self.SetPosition((region.left, region.top))
 
         # Transparency
-        self.SetTransparent(int(255 * 0.7))
+        self.SetTransparent(int(255 * OSD_OPACITY))
         
         # Background color
         self.bg_color = wx.Colour("black")
@@ -242,8 +498,6 @@ class WxFrame(wx.Frame):
             except Exception as e:
                 print(f"Не удалось установить атрибут окна для исключения из захвата: {e}")
 
-        self.sct = mss.mss()
-
         # Main panel and sizer
         self.panel = wx.Panel(self)
         self.panel.SetBackgroundColour(self.bg_color)
@@ -259,15 +513,15 @@ class WxFrame(wx.Frame):
         
         self.sizer.Add(self.info_label, 1, wx.EXPAND | wx.ALL, 10)
         self.panel.SetSizer(self.sizer)
+        self.panel.SetSize(self.GetClientSize())
+
+        self.font_fitter = FontFitter(min_size=8, max_size=16)
+        self.glyph_mask = None # Пиксели текста окна, для вычитания окна из снимка
+        self.changed_at = 0.0 # Когда изображение окна на экране последний раз менялось
         
         self.set_text_and_adjust_font("Запуск...")
 
-        self.Bind(wx.EVT_CLOSE, self.on_closing)
-
-        # Timer for processing queue
-        self.timer = wx.Timer(self)
-        self.Bind(wx.EVT_TIMER, self.run_work, self.timer)
-        self.timer.Start(100) # Poll every 100ms
+        self.Bind(wx.EVT_CLOSE, on_close)
 
     def set_text_and_adjust_font(self, text):
         # найти в text последовательность из более чем трех одинаковых символов и оставить только три таких символа
@@ -282,97 +536,132 @@ class WxFrame(wx.Frame):
                 new_words.append(word)
         text = ' '.join(new_words)
 
-        f = wx.Font(14, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
-        self.info_label.SetFont(f)
-        
-        self.info_label.SetLabel(text)
-        
-        return
-    
-        # надо переработать подбор размера шрифта
+        # Подбор размера шрифта идет вне экрана; виджет обновляется один раз
+        target_width, target_height = self.panel.GetSize()
+        size, wrapped = self.font_fitter.fit(text, target_width - 20, target_height - 20)
+        self.info_label.SetFont(self.font_fitter.font(size))
+        self.info_label.SetLabel(wrapped)
+        self.panel.Layout()
+        self.Update() # Перерисовать сразу, а не при следующем простое цикла событий
+        self.glyph_mask = render_glyph_mask(
+            self.GetClientSize(), self.font_fitter.font(size), wrapped, self.info_label.GetPosition()
+        )
+        self.changed_at = time.perf_counter()
 
-        max_font_size = 16
-        min_font_size = 8
+    def overlay_mask(self, union):
+        """Изображение окна в координатах снимка объединенной области."""
+        x0, y0, _, _ = self.region.box_in(union)
+        height, width = self.glyph_mask.shape
+        return OverlayMask(box=(x0, y0, x0 + width, y0 + height), alpha=OSD_OPACITY, glyphs=self.glyph_mask)
 
-        # panel_width, _ = self.GetClientSize()
-        target_width, target_height = self.panel.GetSize()
-        target_width -= 20
-        target_height -= 20
 
-        for size in range(max_font_size, min_font_size - 1, -1):
-            f = wx.Font(size, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
-            self.info_label.SetFont(f)
-            
-            self.info_label.SetLabel(text)
-            self.info_label.Wrap(target_width)
-            self.panel.Layout()
-
-            # После того как Wrap() и Layout() отработали,
-            # GetSize() вернет реальную высоту, которую занял виджет.
-            # Это самый надежный способ узнать высоту текста с переносами.
-            req_height = self.info_label.GetBestSize().GetHeight()
-            
-            print(f'Высота {req_height}px <= {target_height}px. Размер шрифта {size}')
-            if req_height <= target_height:
-                break
-        
-        self.Layout()
+class OverlayManager(wx.EvtHandler):
+    """
+    Управляет окнами OSD всех областей: разбирает очередь сообщений GUI
+    и делает один снимок экрана на объединенную область.
+    """
+    def __init__(self, regions):
+        super().__init__()
+
+        # DPI awareness
+        if sys.platform == "win32":
+            try:
+                ctypes.windll.user32.SetProcessDPIAware()
+            except Exception as e:
+                print(f"Could not set DPI awareness: {e}")
+
+        self.union = union_area(regions)
+        self.overlays = {region.name: WxFrame(region, self.on_closing) for region in regions}
+        self.win32_capture_mode = all(o.win32_capture_mode for o in self.overlays.values())
+
+        self.capture = ScreenCapture(self.union, slots=OCR_WORKERS + 6, ring=shared_ring)
+        self.recorder = FrameRecorder(RECORD_CORPUS_DIR, self.union, regions) if RECORD_CORPUS_DIR else None
+
+        # Сообщения доставляются через wx.CallAfter, таймер опроса не нужен
+        self.closed = False
+        gui_queue.attach(self.handle)
+
+    def _targets(self, message_dto):
+        if message_dto.region:
+            return [self.overlays[message_dto.region]]
+        return list(self.overlays.values())
 
     def _capture_screen(self):
         try:
-            sct_img = self.sct.grab(text_area)
-            img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-            return img
+            # Один снимок на все области, стадия сравнения сама режет его на части
+            with metrics.timer("capture"):
+                frame = self.capture.grab()
+            metrics.inc("frames_captured")
+            return frame
         except Exception as e:
             print(f"Ошибка при захвате экрана: {e}")
             return None
 
-    def run_work(self, event):
+    def handle(self, message_dto: Message):
+        if self.closed:
+            return
         if shutdown_event.is_set():
-            if not self.IsBeingDeleted():
-                self.shutdown()
+            self.shutdown()
             return
 
-        try:
-            message_dto: Message = gui_queue.get_nowait()
-
-            match message_dto.command:
-                case Command.REQUEST_CAPTURE:
-                    def capture_and_send():
-                        img = self._capture_screen()
-                        if img is None:
-                            return
-                        try:
-                            capture_queue.put_nowait(img)
-                        except queue.Full:
-                            pass
-
-                    if self.win32_capture_mode or not self.IsShown():
+        match message_dto.command:
+            case Command.REQUEST_CAPTURE:
+                requested_at = time.perf_counter()
+
+                def capture_and_send(masks=()):
+                    frame = self._capture_screen()
+                    if frame is None:
+                        return
+                    if masks:
+                        with metrics.timer("capture_unblend"):
+                            unblend(frame.image, masks)
+                    if self.recorder is not None:
+                        self.recorder.add(frame)
+                    capture_queue.put(frame)
+
+                shown = [o for o in self.overlays.values() if o.IsShown()]
+                if self.win32_capture_mode or not shown:
+                    capture_and_send()
+                elif CAPTURE_OVERLAY_MODE == "unblend":
+                    # Окно остается на экране, его вклад убирается из снимка. Пока новая
+                    # надпись может быть еще не выведена, снимок откладывается: иначе
+                    # вычиталась бы маска не того текста, что на экране
+                    changed_at = max(overlay.changed_at for overlay in self.overlays.values())
+                    wait = changed_at + OVERLAY_REPAINT_DELAY - requested_at
+                    if wait > 0:
+                        metrics.inc("capture_deferred")
+                        wx.CallLater(int(wait * 1000) + 1, self.handle, Message(command=Command.REQUEST_CAPTURE))
+                        return
+                    capture_and_send([overlay.overlay_mask(self.union) for overlay in shown])
+                else:
+                    for overlay in shown:
+                        overlay.SetTransparent(0)
+
+                    def capture_after_hide():
+                        # Сколько стоит скрытие окна на время снимка
+                        metrics.observe("capture_hide_wait", time.perf_counter() - requested_at)
                         capture_and_send()
-                    else:
-                        self.SetTransparent(0)
-
-                        def capture_after_hide():
-                            capture_and_send()
-                            if osd_window_is_visible:
-                                self.SetTransparent(int(255 * 0.7))
+                        if osd_window_is_visible:
+                            for overlay in shown:
+                                overlay.SetTransparent(int(255 * OSD_OPACITY))
 
-                        wx.CallLater(50, capture_after_hide)
+                    wx.CallLater(50, capture_after_hide)
 
-                case Command.STOP:
-                    self.shutdown()
-                    return
+            case Command.STOP:
+                self.shutdown()
+                return
 
-                case Command.SHOW:
+            case Command.SHOW:
+                for overlay in self._targets(message_dto):
                     if message_dto.payload is not None:
-                        self.set_text_and_adjust_font(message_dto.payload)
-                    if osd_window_is_visible:
-                        self.Show()
+                        overlay.set_text_and_adjust_font(message_dto.payload)
+                    if osd_window_is_visible and overlay.Show():
+                        overlay.changed_at = time.perf_counter()
 
-                case Command.HIDE:
-                    self.Hide()
-        except queue.Empty:
-            pass
+            case Command.HIDE:
+                for overlay in self._targets(message_dto):
+                    if overlay.Hide():
+                        overlay.changed_at = time.perf_counter()
 
     def on_closing(self, event):
         if not shutdown_event.is_set():
@@ -381,18 +670,30 @@ class WxFrame(wx.Frame):
         self.shutdown()
 
     def shutdown(self):
+        if self.closed:
+            return
         print("GUI: закрытие.")
-        if self.timer.IsRunning():
-            self.timer.Stop()
-        try:
-            capture_queue.put_nowait(None)
-        except queue.Full:
-            pass
-        
-        if not self.IsBeingDeleted():
-            wx.CallAfter(self.Destroy)
+        self.closed = True
+        gui_queue.attach(None)
+        capture_queue.put(None)
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+        for overlay in self.overlays.values():
+            if not overlay.IsBeingDeleted():
+                wx.CallAfter(overlay.Destroy)
 
 if __name__ == "__main__":
+    metrics.gauge("gui_queue_depth", gui_queue.qsize)
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    MemoryMonitor(metrics, MEMORY_MONITOR_INTERVAL, TRACEMALLOC_FRAMES).start(shutdown_event)
+
+    if USE_WORKER_PROCESS:
+        union = union_area(regions)
+        shared_ring = SharedFrameRing((union["height"], union["width"]), OCR_WORKERS + 6)
+
     translator_worker = threading.Thread(target=translator_thread, daemon=True)
     translator_worker.start()
     
@@ -402,17 +703,27 @@ if __name__ == "__main__":
     refresher_worker = threading.Thread(target=refresher_thread, daemon=True)
     refresher_worker.start()
 
+    if REGION_DISCOVERY:
+        RegionDiscovery(cpu_budget=REGION_DISCOVERY_CPU_BUDGET).start(on_region_suggested, shutdown_event)
+
     app = wx.App(False)
-    gui_app = WxFrame()
-    gui_app.Hide()
+    gui_app = OverlayManager(regions)
+    # Окна показываются сразу с надписью о запуске, пока модели грузятся в фоне
+    for overlay in gui_app.overlays.values():
+        overlay.Show()
     app.MainLoop()
     exit_code = 0
 
     # После завершения GUI-цикла, дожидаемся корректного завершения всех потоков.
     print("GUI завершен. Ожидание завершения рабочих потоков...")
+    # Планировщик может спать без таймаута, если захват выключен
+    shutdown_event.set()
+    capture_scheduler.wake()
     translator_worker.join()
     refresher_worker.join()
     hotkey_worker.join()
+    if shared_ring is not None:
+        shared_ring.close()
 
     print("Программа завершена.")
     sys.exit(exit_code)
\ No newline at end of file
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+
+import wx
+
+
+class FontFitter:
+    """
+    Подбор размера шрифта, при котором текст помещается в окно OSD.
+
+    Текст измеряется вне экрана в wx.MemoryDC и переносится по словам
+    вручную, поэтому подбор не трогает виджеты и не вызывает Layout().
+    Размер ищется двоичным поиском, измерения кэшируются по
+    (текст, ширина, размер): повторный показ того же перевода ничего не считает.
+    """
+
+    def __init__(self, min_size=8, max_size=16, family=wx.FONTFAMILY_DEFAULT, cache_size=512):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.family = family
+        self.cache_size = cache_size
+        self._cache = OrderedDict() # (текст, ширина, размер) -> (текст с переносами, высота)
+        self._fonts = {}
+        self._dc = wx.MemoryDC(wx.Bitmap(1, 1))
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = wx.Font(size, self.family, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+        return font
+
+    def _wrap(self, text, width):
+        """Переносит текст по словам так, чтобы каждая строка была не шире width."""
+        dc = self._dc
+        space = dc.GetTextExtent(" ")[0]
+        lines = []
+        for paragraph in text.split("\n"):
+            line, line_width = [], 0
+            for word in paragraph.split():
+                word_width = dc.GetTextExtent(word)[0]
+                if line and line_width + space + word_width > width:
+                    lines.append(" ".join(line))
+                    line, line_width = [word], word_width
+                else:
+                    line_width += word_width + (space if line else 0)
+                    line.append(word)
+            lines.append(" ".join(line))
+        return "\n".join(lines)
+
+    def measure(self, text, width, size):
+        """Возвращает (текст с переносами, высота) для шрифта данного размера."""
+        key = (text, width, size)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return cached
+
+        self.misses += 1
+        self._dc.SetFont(self.font(size))
+        wrapped = self._wrap(text, width)
+        height = self._dc.GetMultiLineTextExtent(wrapped)[1]
+        result = (wrapped, height)
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def fit(self, text, width, height):
+        """
+        Наибольший размер шрифта, при котором текст помещается в width x height.
+        Возвращает (размер, текст с переносами); если не помещается даже
+        минимальный размер, возвращается минимальный.
+        """
+        low, high = self.min_size, self.max_size
+        best = low
+        while low <= high:
+            size = (low + high) // 2
+            if self.measure(text, width, size)[1] <= height:
+                best = size
+                low = size + 1
+            else:
+                high = size - 1
+        return best, self.measure(text, width, best)[0]
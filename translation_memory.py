@@ -0,0 +1,119 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Нормализует исходный текст для использования в качестве ключа."""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class TranslationMemory:
+    """
+    Память переводов: LRU в памяти процесса поверх таблицы SQLite на диске.
+
+    Ключ - нормализованный исходный текст и языковая пара.
+    Переживает перезапуск программы.
+    """
+
+    def __init__(self, path="translation_memory.sqlite3", max_memory_bytes=4 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self._lru = OrderedDict()
+        self._lru_bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # Соединение используется из разных потоков, доступ защищен блокировкой
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                from_code TEXT NOT NULL,
+                to_code TEXT NOT NULL,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (from_code, to_code, source)
+            )
+            """
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _entry_size(key, value):
+        return len(key[2].encode()) + len(value.encode())
+
+    def _remember(self, key, value):
+        """Кладет запись в LRU и вытесняет старые записи при превышении лимита."""
+        if key in self._lru:
+            self._lru_bytes -= self._entry_size(key, self._lru.pop(key))
+        self._lru[key] = value
+        self._lru_bytes += self._entry_size(key, value)
+        while self._lru_bytes > self.max_memory_bytes and self._lru:
+            old_key, old_value = self._lru.popitem(last=False)
+            self._lru_bytes -= self._entry_size(old_key, old_value)
+
+    def get(self, text, from_code, to_code):
+        """Возвращает сохраненный перевод или None."""
+        key = (from_code, to_code, normalize_text(text))
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+            row = self._db.execute(
+                "SELECT target FROM translations WHERE from_code=? AND to_code=? AND source=?",
+                key,
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._db.execute(
+                "UPDATE translations SET hits=hits+1, last_used=? WHERE from_code=? AND to_code=? AND source=?",
+                (time.time(), *key),
+            )
+            self._db.commit()
+            self._remember(key, row[0])
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, text, from_code, to_code, translated_text):
+        """Сохраняет перевод в памяти и на диске."""
+        key = (from_code, to_code, normalize_text(text))
+        with self._lock:
+            self._remember(key, translated_text)
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations (from_code, to_code, source, target, hits, last_used) "
+                "VALUES (?, ?, ?, ?, 0, ?)",
+                (*key, translated_text, time.time()),
+            )
+            self._db.commit()
+
+    def stats(self):
+        """Счетчики попаданий и промахов."""
+        with self._lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / total if total else 0.0,
+                "memory_entries": len(self._lru),
+                "memory_bytes": self._lru_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,329 @@
+import http.client
+import json
+import queue
+import socket
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class TranslationTimeout(Exception):
+    """Переводчик не ответил вовремя; конвейер оставляет на экране прежний перевод."""
+
+
+class ArgosBatchTranslator:
+    """
+    Пакетный перевод моделью CTranslate2 из установленного пакета argostranslate.
+
+    Текст уже разбит на предложения конвейером, поэтому разбиение на
+    предложения внутри argos не нужно: все предложения токенизируются и
+    отправляются в translate_batch одним вызовом. Если пакет устроен
+    иначе (например, перевод идет через промежуточный язык), каждое
+    предложение переводится обычным translate() argos.
+    """
+
+    def __init__(self, from_code="en", to_code="ru", beam_size=4, max_batch_size=32,
+                 inter_threads=1, intra_threads=0, compute_type="int8", device="cpu"):
+        # Тяжелые модули импортируются лениво, в потоке-обработчике
+        import ctranslate2
+        from argostranslate import translate
+
+        self.beam_size = beam_size
+        self.max_batch_size = max_batch_size
+
+        languages = {lang.code: lang for lang in translate.get_installed_languages()}
+        self.translation = languages[from_code].get_translation(languages[to_code])
+
+        # argostranslate 1.9 возвращает обертку CachedTranslation: сам перевод лежит в underlying
+        underlying = getattr(self.translation, "underlying", self.translation)
+        self.pkg = getattr(underlying, "pkg", None)
+        self.translator = None
+        if self.pkg is not None and getattr(self.pkg, "tokenizer", None) is not None:
+            self.translator = ctranslate2.Translator(
+                str(self.pkg.package_path / "model"),
+                device=device,
+                compute_type=compute_type,
+                inter_threads=inter_threads,
+                intra_threads=intra_threads,
+            )
+            self.target_prefix = getattr(self.pkg, "target_prefix", "") or ""
+        else:
+            print(f"Пакетный перевод CTranslate2 недоступен для {from_code}->{to_code}: "
+                  f"предложения переводятся по одному через argostranslate.")
+
+    def translate_batch(self, texts):
+        if self.translator is None:
+            return [self.translation.translate(text) for text in texts]
+
+        tokenizer = self.pkg.tokenizer
+        tokenized = [tokenizer.encode(text) for text in texts]
+        target_prefix = None
+        if self.target_prefix:
+            target_prefix = [[self.target_prefix]] * len(tokenized)
+        results = self.translator.translate_batch(
+            tokenized,
+            target_prefix=target_prefix,
+            replace_unknowns=True,
+            max_batch_size=self.max_batch_size,
+            beam_size=self.beam_size,
+            num_hypotheses=1,
+            length_penalty=0.2,
+        )
+        translated = []
+        for result in results:
+            value = tokenizer.decode(result.hypotheses[0])
+            if self.target_prefix and value.startswith(self.target_prefix):
+                value = value[len(self.target_prefix):]
+            translated.append(value.strip())
+        return translated
+
+    def close(self):
+        """Модель освобождается вместе с объектом; метод нужен для единообразия с сетевым переводчиком."""
+
+
+class LibreTranslateBackend:
+    """
+    Пакетный перевод на сервере, совместимом с API LibreTranslate (POST /translate).
+
+    Позволяет вынести тяжелую модель с игрового компьютера на другую
+    машину в локальной сети. Соединения HTTP/1.1 держатся открытыми и
+    переиспользуются (пул keep-alive), поэтому запрос не тратит время на
+    установку соединения. Одинаковые тексты, которые уже переводятся,
+    повторно не отправляются: ожидающий получает результат того же
+    запроса. Если ответ не пришел за timeout секунд, вызывается
+    TranslationTimeout, а запрос продолжает выполняться: опоздавший
+    ответ сохраняется и достается повторной попытке без нового запроса.
+    """
+
+    def __init__(self, url, from_code="en", to_code="ru", api_key=None, timeout=2.0, pool_size=4):
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme == "https":
+            self._connection_class = http.client.HTTPSConnection
+        else:
+            self._connection_class = http.client.HTTPConnection
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._path = parsed.path.rstrip("/") + "/translate"
+        self.from_code = from_code
+        self.to_code = to_code
+        self.api_key = api_key
+        self.timeout = timeout
+
+        self._pool = queue.LifoQueue(maxsize=pool_size) # Свободные открытые соединения
+        self._active = set() # Соединения, по которым сейчас идет запрос
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+        self._lock = threading.Lock()
+        self._inflight = {} # Текст -> Future запроса, который его уже переводит
+        self._recent = OrderedDict() # Последние полученные переводы, в том числе опоздавшие
+        self.recent_size = 256
+        self.requests = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def _connection(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            # Таймаут сокета больше таймаута ожидания: медленный ответ все равно дочитывается
+            return self._connection_class(self._host, self._port, timeout=self.timeout * 5)
+
+    def _release(self, connection):
+        with self._lock:
+            self._active.discard(connection)
+            if not self._closed:
+                try:
+                    self._pool.put_nowait(connection)
+                    return
+                except queue.Full:
+                    pass
+        connection.close()
+
+    def _post(self, texts):
+        payload = {"q": texts, "source": self.from_code, "target": self.to_code, "format": "text"}
+        if self.api_key:
+            payload["api_key"] = self.api_key
+        body = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+
+        for attempt in range(2):
+            connection = self._connection()
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Сетевой переводчик закрыт")
+                self._active.add(connection)
+            try:
+                connection.request("POST", self._path, body, headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                with self._lock:
+                    self._active.discard(connection)
+                connection.close()
+                if self._closed:
+                    raise
+                # Сервер мог закрыть простаивавшее соединение - повторяем на новом
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                with self._lock:
+                    self._active.discard(connection)
+                connection.close()
+            else:
+                self._release(connection)
+            if response.status != 200:
+                raise RuntimeError(f"LibreTranslate: HTTP {response.status}: {data[:200]!r}")
+            translated = json.loads(data)["translatedText"]
+            return translated if isinstance(translated, list) else [translated]
+
+    def _request(self, texts, futures):
+        self.requests += 1
+        try:
+            translated = self._post(texts)
+            with self._lock:
+                for text, value in zip(texts, translated):
+                    self._recent[text] = value
+                    self._recent.move_to_end(text)
+                while len(self._recent) > self.recent_size:
+                    self._recent.popitem(last=False)
+            for future, value in zip(futures, translated):
+                future.set_result(value)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+        finally:
+            with self._lock:
+                for text in texts:
+                    self._inflight.pop(text, None)
+
+    def translate_batch(self, texts):
+        futures = {}
+        new = []
+        with self._lock:
+            for text in dict.fromkeys(texts):
+                future = self._inflight.get(text)
+                if future is None and text in self._recent:
+                    future = Future()
+                    future.set_result(self._recent[text])
+                elif future is None:
+                    future = self._inflight[text] = Future()
+                    new.append(text)
+                else:
+                    self.coalesced += 1
+                futures[text] = future
+        if new:
+            self._executor.submit(self._request, new, [futures[text] for text in new])
+
+        deadline = time.monotonic() + self.timeout
+        try:
+            return [futures[text].result(max(0.0, deadline - time.monotonic())) for text in texts]
+        except FutureTimeoutError:
+            self.timeouts += 1
+            raise TranslationTimeout(f"Сервер перевода не ответил за {self.timeout} с")
+
+    def close(self):
+        """Закрывает соединения, в том числе те, по которым еще ждут ответа."""
+        with self._lock:
+            self._closed = True
+            active = list(self._active)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for connection in active:
+            # Прерывает чтение ответа в потоке пула: зависший запрос не переживет программу
+            if connection.sock is not None:
+                try:
+                    connection.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def create_backend(backend="argos", from_code="en", to_code="ru", **options):
+    """
+    Переводчик по имени: "argos" (модель в этом процессе) или
+    "libretranslate" (сервер в сети). Возвращается объект с методом
+    translate_batch(список текстов) -> список переводов.
+    """
+    if backend == "argos":
+        return ArgosBatchTranslator(from_code, to_code, **options)
+    if backend == "libretranslate":
+        return LibreTranslateBackend(from_code=from_code, to_code=to_code, **options)
+    raise ValueError(f"Неизвестный переводчик: {backend}")
+
+
+class TranslationService:
+    """
+    Собирает запросы на перевод из всех потоков в течение короткого окна
+    и отправляет их переводчику одним пакетом.
+    """
+
+    def __init__(self, translate_batch, window=0.02, max_batch=32):
+        self.translate_batch = translate_batch # Функция: список текстов -> список переводов
+        self.window = window
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending = [] # (текст, Future)
+        self._closed = False
+        self.batches = 0
+        self.batched_texts = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, texts):
+        """Ставит тексты в очередь и возвращает список Future."""
+        futures = [Future() for _ in texts]
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Сервис перевода остановлен")
+            self._pending.extend(zip(texts, futures))
+            self._cond.notify()
+        return futures
+
+    def translate_many(self, texts):
+        return [future.result() for future in self.submit(texts)]
+
+    def translate(self, text, from_code=None, to_code=None):
+        return self.translate_many([text])[0]
+
+    def _take_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._closed)
+            if not self._pending:
+                return None
+            # Ждем, пока подтянутся запросы из других потоков
+            self._cond.wait_for(lambda: len(self._pending) >= self.max_batch or self._closed, self.window)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                break
+
+            # Одинаковые тексты переводятся один раз
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                translated = dict(zip(unique, self.translate_batch(unique)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batched_texts += len(unique)
+            for text, future in batch:
+                future.set_result(translated[text])
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
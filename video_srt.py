@@ -0,0 +1,306 @@
+"""
+Перевод вшитых субтитров видеофайла в файл .srt без экрана и GUI.
+
+Детектор изменений находит границы субтитров по маске яркого текста
+(движущийся фон за субтитром их не создает), поэтому распознается
+один кадр на каждый отдельный субтитр. Распознавание идет параллельно
+в нескольких процессах, пока основной процесс декодирует видео, а
+перевод - пакетами через тот же CTranslate2, что и в живом режиме.
+
+Примеры:
+    python video_srt.py movie.mkv --area 865,535,840,130
+    python video_srt.py movie.mkv --area 865,535,840,130 --sample-fps 5 --workers 4 -o movie.ru.srt
+    python video_srt.py movie.mkv --area 865,535,840,130 --no-translate
+"""
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+import cv2
+
+from change_detector import ChangeDetector
+from ocr_preprocess import PRESETS
+from pipeline import Pipeline, LatestQueue, RegionFrame
+from regions import Region
+from stabilizer import is_growing
+
+REGION_NAME = "video"
+
+
+@dataclass
+class Cue:
+    """Субтитр: интервал времени в секундах и текст."""
+    start: float
+    end: float
+    text: str
+    translation: str = ""
+
+
+def format_timestamp(seconds):
+    """Время в формате SRT: ЧЧ:ММ:СС,мс."""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+def write_srt(path, cues):
+    with open(path, "w", encoding="utf-8") as f:
+        for number, cue in enumerate(cues, 1):
+            f.write(f"{number}\n{format_timestamp(cue.start)} --> {format_timestamp(cue.end)}\n")
+            f.write(f"{cue.translation or cue.text}\n\n")
+
+
+# --- Распознавание в рабочих процессах ---
+
+_ocr_pipeline = None
+
+
+def _init_ocr_worker(width, height, use_text_localizer, ocr_preset, min_confidence):
+    """Каждый рабочий процесс создает свой конвейер с одним экземпляром Tesseract."""
+    global _ocr_pipeline
+    _ocr_pipeline = Pipeline(
+        frames=LatestQueue(),
+        regions=[Region(REGION_NAME, 0, 0, width, height)],
+        on_show=lambda region, text: None,
+        on_hide=lambda region: None,
+        translation_memory_path=":memory:",
+        ocr_workers=1,
+        use_text_localizer=use_text_localizer,
+        ocr_preset=ocr_preset,
+        min_line_confidence=min_confidence,
+        min_frame_confidence=min_confidence,
+    )
+
+
+def _recognize(image):
+    """Распознает кадр субтитра и возвращает очищенный текст (пустой, если текста нет)."""
+    job = _ocr_pipeline.ocr_stage(RegionFrame(region=REGION_NAME, seq=0, image=image, captured_at=0.0))
+    return job.text if job is not None else ""
+
+
+def merge_cues(cues, min_duration=0.2):
+    """
+    Склеивает соседние субтитры с одинаковым текстом (изменился только фон)
+    и субтитры, которые "печатаются" посимвольно, а также отбрасывает пустые.
+    """
+    merged = []
+    for cue in cues:
+        if not cue.text:
+            continue
+        if merged and merged[-1].end >= cue.start - 1e-3:
+            previous = merged[-1]
+            if cue.text == previous.text:
+                previous.end = cue.end
+                continue
+            if is_growing(previous.text, cue.text):
+                cue.start = previous.start
+                merged[-1] = cue
+                continue
+        merged.append(cue)
+    return [cue for cue in merged if cue.end - cue.start >= min_duration]
+
+
+class VideoSubtitleExtractor:
+    """
+    Читает видео через cv2.VideoCapture, вырезает область субтитров и
+    делит видео на отрезки, внутри которых не меняется текст: сравниваются
+    не сами кадры, а маски пикселей ярче text_threshold, в которых остается
+    субтитр, а не фон. Для каждого отрезка распознается последний кадр:
+    к этому моменту субтитр уже полностью проявился или допечатался.
+    Кадры, ждущие OCR, держатся в памяти не больше max_pending штук.
+    """
+
+    def __init__(self, path, area, sample_fps=10.0, workers=None, use_text_localizer=True, ocr_preset="otsu",
+                 min_confidence=50, text_threshold=200, max_pending=None):
+        self.path = path
+        self.area = area
+        self.sample_fps = sample_fps # Сколько кадров в секунду сравнивать, остальные пропускаются без декодирования
+        self.workers = workers or os.cpu_count() or 1
+        self.use_text_localizer = use_text_localizer
+        self.ocr_preset = ocr_preset
+        self.min_confidence = min_confidence # Строки и кадры с меньшей уверенностью OCR отбрасываются
+        self.text_threshold = text_threshold # Яркость пикселей субтитра (0 - сравнивать кадры целиком)
+        self.max_pending = max_pending or self.workers * 2 # Сколько кадров может ждать OCR
+        self.duration = 0.0
+        self.frames_read = 0
+        self.segments = 0
+
+    def extract(self):
+        """Возвращает список Cue с распознанным (непереведенным) текстом."""
+        capture = cv2.VideoCapture(self.path)
+        if not capture.isOpened():
+            raise RuntimeError(f"Не удалось открыть видео {self.path}")
+
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        step = max(1, round(fps / self.sample_fps)) if self.sample_fps else 1
+        top, left = self.area["top"], self.area["left"]
+        bottom, right = top + self.area["height"], left + self.area["width"]
+
+        detector = ChangeDetector()
+        cues = []
+        pending = {} # Future распознавания -> Cue
+        start = None # Начало текущего отрезка
+        last_crop = None # Последний кадр текущего отрезка
+        index = 0
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_ocr_worker,
+            initargs=(self.area["width"], self.area["height"], self.use_text_localizer, self.ocr_preset,
+                      self.min_confidence),
+        ) as executor:
+            def collect(block):
+                """Забирает готовые результаты; при block ждет хотя бы один."""
+                done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.pop(future).text = future.result()
+
+            def close_segment(end):
+                cue = Cue(start=start, end=end, text="")
+                cues.append(cue)
+                # Декодирование обгоняет OCR: ждем, пока освободится место в очереди
+                while len(pending) >= self.max_pending:
+                    collect(block=True)
+                pending[executor.submit(_recognize, last_crop)] = cue
+                collect(block=False)
+
+            while True:
+                # grab() без retrieve() не тратит время на преобразование кадра
+                if not capture.grab():
+                    break
+                timestamp = index / fps
+                index += 1
+                if (index - 1) % step:
+                    continue
+                ok, image = capture.retrieve()
+                if not ok:
+                    break
+                self.frames_read += 1
+
+                crop = cv2.cvtColor(image[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+                mask = crop
+                if self.text_threshold:
+                    _, mask = cv2.threshold(crop, self.text_threshold, 255, cv2.THRESH_BINARY)
+                if detector.update(mask).changed:
+                    if start is not None:
+                        close_segment(timestamp)
+                    start = timestamp
+                last_crop = crop
+
+            self.duration = index / fps
+            if start is not None:
+                close_segment(self.duration)
+
+            while pending:
+                collect(block=True)
+
+        capture.release()
+        self.segments = len(cues)
+        return merge_cues(cues)
+
+
+def translate_cues(cues, from_code="en", to_code="ru", translation_memory_path=":memory:",
+                   batch_window=0.02, max_batch=32, beam_size=4, glossary_path=None):
+    """
+    Переводит субтитры через TranslationService: запросы из нескольких
+    потоков собираются в пакеты для CTranslate2, повторяющиеся
+    предложения берутся из памяти переводов.
+    """
+    from translation_service import ArgosBatchTranslator, TranslationService
+
+    translator = ArgosBatchTranslator(from_code, to_code, beam_size=beam_size, max_batch_size=max_batch)
+    service = TranslationService(
+        translator.translate_batch,
+        window=batch_window,
+        max_batch=max_batch,
+    )
+    pipeline = Pipeline(
+        frames=LatestQueue(),
+        regions=[Region(REGION_NAME, 0, 0, 1, 1)],
+        on_show=lambda region, text: None,
+        on_hide=lambda region: None,
+        translation_memory_path=translation_memory_path,
+        ocr_workers=1,
+        use_text_localizer=False,
+        translate_batch_fn=service.translate_many,
+        glossary_path=glossary_path,
+        from_code=from_code,
+        to_code=to_code,
+    )
+    try:
+        texts = list(dict.fromkeys(cue.text for cue in cues))
+        with ThreadPoolExecutor(max_workers=max_batch) as executor:
+            translated = dict(zip(texts, executor.map(pipeline.translate, texts)))
+        for cue in cues:
+            cue.translation = translated[cue.text]
+    finally:
+        pipeline.stop()
+        service.close()
+        translator.close()
+    return cues
+
+
+def parse_area(value):
+    top, left, width, height = (int(part) for part in value.split(","))
+    return {"top": top, "left": left, "width": width, "height": height}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Распознавание и перевод вшитых субтитров видео в файл .srt.")
+    parser.add_argument("video", help="видеофайл")
+    parser.add_argument("--area", type=parse_area, required=True,
+                        help="область субтитров в кадре: top,left,width,height (как text_areas в start.py)")
+    parser.add_argument("-o", "--output", help="файл .srt (по умолчанию рядом с видео)")
+    parser.add_argument("--from", dest="from_code", default="en", help="язык субтитров")
+    parser.add_argument("--to", dest="to_code", default="ru", help="язык перевода")
+    parser.add_argument("--sample-fps", type=float, default=10.0,
+                        help="сколько кадров в секунду сравнивать (0 - все кадры)")
+    parser.add_argument("--text-threshold", type=int, default=200,
+                        help="яркость пикселей субтитра для поиска границ (0 - сравнивать кадры целиком)")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов OCR (по умолчанию по числу ядер)")
+    parser.add_argument("--no-translate", action="store_true", help="записать распознанный текст без перевода")
+    parser.add_argument("--no-mser", action="store_true", help="распознавать всю область без поиска строк")
+    parser.add_argument("--preset", default="otsu", choices=sorted(PRESETS), help="предобработка кадра перед OCR")
+    parser.add_argument("--min-confidence", type=float, default=50,
+                        help="минимальная уверенность OCR для строки и кадра (0-100)")
+    parser.add_argument("--glossary", help="словарь терминов с фиксированным переводом")
+    parser.add_argument("--memory", default=":memory:", help="файл памяти переводов")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.video)[0] + (
+        ".srt" if args.no_translate else f".{args.to_code}.srt"
+    )
+
+    started = time.perf_counter()
+    extractor = VideoSubtitleExtractor(
+        args.video,
+        args.area,
+        sample_fps=args.sample_fps,
+        workers=args.workers,
+        use_text_localizer=not args.no_mser,
+        ocr_preset=args.preset,
+        min_confidence=args.min_confidence,
+        text_threshold=args.text_threshold,
+    )
+    cues = extractor.extract()
+    recognized = time.perf_counter()
+    print(f"Кадров сравнено: {extractor.frames_read}, отрезков распознано: {extractor.segments}, "
+          f"субтитров: {len(cues)} за {recognized - started:.1f} с")
+
+    if not args.no_translate and cues:
+        translate_cues(cues, args.from_code, args.to_code, translation_memory_path=args.memory,
+                       glossary_path=args.glossary)
+        print(f"Перевод: {time.perf_counter() - recognized:.1f} с")
+
+    write_srt(output, cues)
+    elapsed = time.perf_counter() - started
+    speed = extractor.duration / elapsed if elapsed else 0.0
+    print(f"Записано {output}: {extractor.duration:.1f} с видео за {elapsed:.1f} с ({speed:.1f}x реального времени)")
+
+
+if __name__ == "__main__":
+    main()